@@ -0,0 +1,9 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import sys
+
+from schemaconvertor.cli import main
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""asyncio convertor, python 3.5+ only
+"""
+
+import asyncio
+import inspect
+import functools
+import collections
+
+from schemaconvertor.convertor import SchemaConst, SchemaConvertor, ObjectShape
+
+
+def _sync_only(name):
+    """Method of SchemaConvertor that can not await hooks
+    """
+    def method(self, *args, **kwargs):
+        raise TypeError("%s.%s can not await hooks, await the convertor "
+                        "instead" % (type(self).__name__, name))
+    method.__name__ = name
+    return method
+
+
+class AsyncSchemaConvertor(SchemaConvertor):
+    """Convertor awaiting coroutine hooks
+
+    Hooks may be plain functions or return awaitables. Subtrees with
+    hooks are converted concurrently across siblings, at most
+    `concurrency` hook calls run at the same time. Array nodes also
+    accept async iterables, items are converted while they arrive, at
+    most `TASK_WINDOW` items (or `concurrency` if larger) of an array are
+    in flight. Subtrees without hooks or arrays are converted
+    synchronously. `warmup` is a coroutine, the other sync entry points
+    raise TypeError.
+    """
+
+    TASK_WINDOW = 64
+
+    def __init__(self, schema, concurrency=None):
+        super(AsyncSchemaConvertor, self).__init__(schema)
+        self.concurrency = concurrency
+        self.async_nodes = {}
+
+    async def __call__(self, data):
+        limit = asyncio.Semaphore(self.concurrency) \
+            if self.concurrency else None
+        return await self._aconvertor(data, self.schema, limit)
+
+    async def warmup(self, *samples):
+        """Compile the schema tree up front and convert the samples to
+        fill the caches, return the compile report
+        """
+        report = self.schema.compile_all()
+        for sample in samples:
+            await self(sample)
+        return report
+
+    map_parallel = _sync_only("map_parallel")
+    iter = _sync_only("iter")
+    columns = _sync_only("columns")
+    iter_encode = _sync_only("iter_encode")
+    dump = _sync_only("dump")
+
+    def _needs_async(self, schema):
+        """Whether the subtree of schema has hooks or arrays
+        """
+        needs_async = self.async_nodes.get(schema)
+        if needs_async is not None:
+            return needs_async
+
+        needs_async = False
+        visited = set()
+        schemas = [schema]
+        while schemas:
+            sch = schemas.pop()
+            if id(sch) in visited:
+                continue
+            visited.add(id(sch))
+            if sch.pre_convert_hooks or sch.post_convert_hooks or \
+                    sch.type == SchemaConst.T_LIST:
+                needs_async = True
+                break
+            schemas.extend(sch.subschemas())
+        self.async_nodes[schema] = needs_async
+        return needs_async
+
+    async def _call_hook(self, hook, data, schema, limit):
+        if limit is None:
+            result = hook(data, schema)
+            if inspect.isawaitable(result):
+                result = await result
+            return result
+
+        async with limit:
+            result = hook(data, schema)
+            if inspect.isawaitable(result):
+                result = await result
+        return result
+
+    async def _aconvertor(self, data, schema, limit):
+        """Main async convertor
+        """
+        if not self._needs_async(schema):
+            return self._convertor(data, schema)
+
+        convertor = self.CONVERTORS.get(schema.type)
+        if convertor is None:
+            raise TypeError("Unknown type: %s" % schema.type)
+
+        for hook in schema.pre_convert_hooks:
+            data = await self._call_hook(hook, data, schema, limit)
+
+        aconvertor = self.ASYNC_CONVERTORS.get(schema.type)
+        if aconvertor is None:
+            result = convertor(self, data, schema)
+        else:
+            result = await aconvertor(self, data, schema, limit)
+
+        for hook in schema.post_convert_hooks:
+            result = await self._call_hook(hook, result, schema, limit)
+        return result
+
+    async def _array_aconvertor(self, data, schema, limit):
+        """iterable and async iterable convertor
+        """
+        real_schema = schema.items
+        if real_schema is SchemaConst.S_DISABLED:
+            return []
+
+        if not self._needs_async(real_schema):
+            if not hasattr(data, "__aiter__"):
+                return self._array_convertor(data, schema)
+            result = []
+            async for item in data:
+                result.append(self._convertor(item, real_schema))
+            return result
+
+        result = []
+        pending = collections.deque()
+        window = max(self.concurrency or 0, self.TASK_WINDOW)
+        try:
+            if hasattr(data, "__aiter__"):
+                async for item in data:
+                    if len(pending) >= window:
+                        result.append(await pending.popleft())
+                    pending.append(asyncio.ensure_future(
+                        self._aconvertor(item, real_schema, limit)))
+            else:
+                for item in data:
+                    if len(pending) >= window:
+                        result.append(await pending.popleft())
+                    pending.append(asyncio.ensure_future(
+                        self._aconvertor(item, real_schema, limit)))
+            while pending:
+                result.append(await pending.popleft())
+        finally:
+            for task in pending:
+                task.cancel()
+        return result
+
+    async def _members_aconvertor(self, schema, names, get, values, limit):
+        """Convert the names matching patternProperties, whose data is read
+        by get only once matched, and the values of properties, siblings
+        are awaited concurrently
+        """
+        keys, coroutines = [], []
+        if schema.pattern_properties_schemas is not SchemaConst.S_DISABLED:
+            for key in names:
+                real_schema = schema.pattern_properties(key, istry=True)
+                if real_schema:
+                    keys.append(key)
+                    coroutines.append(
+                        self._aconvertor(get(key), real_schema, limit))
+
+        if schema.properties_schemas is not SchemaConst.S_DISABLED:
+            for (key, real_schema), real_data in zip(
+                    schema.properties_schemas.items(), values):
+                keys.append(key)
+                coroutines.append(
+                    self._aconvertor(real_data, real_schema, limit))
+
+        result = {}
+        for key, value in zip(keys, await asyncio.gather(*coroutines)):
+            result[key] = value
+        return result
+
+    async def _dict_aconvertor(self, data, schema, limit):
+        """Dict async convertor
+        """
+        return await self._members_aconvertor(
+            schema, data, data.__getitem__,
+            (data[key] for key in schema.properties_schemas), limit)
+
+    async def _object_aconvertor(self, data, schema, limit):
+        """Object async convertor
+        """
+        cls = type(data)
+        shape = ObjectShape.of(cls)
+        values = ()
+        if schema.properties_schemas is not SchemaConst.S_DISABLED:
+            values = schema.object_getter(cls)(data)
+        return await self._members_aconvertor(
+            schema, shape.names(data), functools.partial(shape.getattr, data),
+            values, limit)
+
+    async def _auto_type_aconvertor(self, data, schema, limit):
+        """when schema.type is None
+        """
+        real_schema = schema.typeof(data, istry=True)
+        if real_schema is not SchemaConst.S_UNDEFINED:
+            return await self._aconvertor(data, real_schema, limit)
+        return self._null_convertor(data, schema)
+
+    ASYNC_CONVERTORS = {
+        SchemaConst.T_DICT: _dict_aconvertor,
+        SchemaConst.T_OBJ: _object_aconvertor,
+        SchemaConst.T_LIST: _array_aconvertor,
+        None: _auto_type_aconvertor,
+    }
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""Benchmarks of SchemaConvertor
+
+    python -m schemaconvertor.benchmarks run -o new.json
+    python -m schemaconvertor.benchmarks compare old.json new.json
+    python -m schemaconvertor.benchmarks jsonlines -n 100000 -j 4
+"""
+
+import sys
+import argparse
+
+from schemaconvertor.benchmarks import runner
+from schemaconvertor.benchmarks.workloads import get_workloads
+
+
+def log(message):
+    sys.stderr.write(message + "\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m schemaconvertor.benchmarks")
+    subparsers = parser.add_subparsers(dest="command")
+
+    run_parser = subparsers.add_parser("run", help="run benchmarks")
+    run_parser.add_argument("-o", "--output", help="save results as JSON")
+    run_parser.add_argument(
+        "-w", "--workload", action="append", help="workload names")
+    run_parser.add_argument(
+        "-s", "--size", action="append", type=int, help="payload sizes")
+    run_parser.add_argument(
+        "-e", "--engine", action="append", choices=sorted(runner.ENGINES))
+    run_parser.add_argument("--min-time", type=float, default=0.2)
+    run_parser.add_argument("--repeat", type=int, default=3)
+
+    compare_parser = subparsers.add_parser(
+        "compare", help="flag regressions between two result files")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.1)
+
+    jsonlines_parser = subparsers.add_parser(
+        "jsonlines", help="JSON-Lines CLI against the naive loop")
+    jsonlines_parser.add_argument("-n", "--records", type=int, default=100000)
+    jsonlines_parser.add_argument("-j", "--workers", type=int, default=None)
+    jsonlines_parser.add_argument("--compiled", action="store_true")
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        document = runner.run(
+            get_workloads(args.workload), args.size or runner.SIZES,
+            args.engine or sorted(runner.ENGINES),
+            args.min_time, args.repeat, log)
+        if args.output:
+            runner.save(document, args.output)
+        return 0
+
+    if args.command == "compare":
+        regressions = runner.compare(
+            runner.load(args.base), runner.load(args.current),
+            args.threshold)
+        for (workload, size, engine), metric, ratio in regressions:
+            log("REGRESSION %s size=%d engine=%s %s x%.2f" % (
+                workload, size, engine, metric, ratio))
+        return 1 if regressions else 0
+
+    if args.command == "jsonlines":
+        result = runner.run_jsonlines(
+            args.records, args.workers, args.compiled, log)
+        return 0 if result["same_output"] else 1
+
+    parser.print_help()
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import gc
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import tempfile
+from timeit import default_timer
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+from schemaconvertor import __version__
+from schemaconvertor.convertor import SchemaConvertor, convert_by_schema
+
+ENGINES = {
+    "interpreter": {},
+    "compiled": {"compiled": True},
+    "batch": {"batch": True},
+}
+SIZES = (100, 1000, 10000)
+
+
+class NodeCounter(SchemaConvertor):
+    """Count the schema nodes visited by a conversion
+    """
+
+    def __init__(self, schema):
+        super(NodeCounter, self).__init__(schema)
+        self.nodes = 0
+
+    def _convertor(self, data, schema):
+        self.nodes += 1
+        return super(NodeCounter, self)._convertor(data, schema)
+
+
+def count_nodes(schema, data):
+    counter = NodeCounter(schema)
+    counter(data)
+    return counter.nodes
+
+
+def measure_time(func, data, min_time=0.2, repeat=3):
+    """Best seconds per call of func(data)
+    """
+    number = 1
+    while True:
+        start = default_timer()
+        for _ in range(number):
+            func(data)
+        elapsed = default_timer() - start
+        if elapsed >= min_time or number >= 1 << 20:
+            break
+        number *= 2
+
+    best = elapsed / number
+    for _ in range(repeat - 1):
+        start = default_timer()
+        for _ in range(number):
+            func(data)
+        best = min(best, (default_timer() - start) / number)
+    return best
+
+
+def measure_memory(func, data):
+    """Peak bytes allocated by func(data), None without tracemalloc
+    """
+    if tracemalloc is None:
+        return None
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func(data)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run(workloads, sizes=SIZES, engines=tuple(ENGINES), min_time=0.2,
+        repeat=3, log=None):
+    """Run workloads, return the result document
+    """
+    results = []
+    for workload in workloads:
+        for size in sizes:
+            data = workload.build(size)
+            nodes = count_nodes(workload.schema, data)
+            for engine in engines:
+                cvtr = SchemaConvertor(workload.schema, **ENGINES[engine])
+                seconds = measure_time(cvtr, data, min_time, repeat)
+                result = {
+                    "workload": workload.name,
+                    "size": size,
+                    "engine": engine,
+                    "nodes": nodes,
+                    "ops_per_sec": 1.0 / seconds,
+                    "ns_per_node": seconds * 1e9 / nodes,
+                    "peak_memory": measure_memory(cvtr, data),
+                }
+                results.append(result)
+                if log is not None:
+                    log(format_result(result))
+    return {
+        "meta": {
+            "version": __version__,
+            "python": sys.version.split()[0],
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+
+def format_result(result):
+    return "%-18s %7d %-12s %12.1f ops/s %10.1f ns/node %12s B" % (
+        result["workload"], result["size"], result["engine"],
+        result["ops_per_sec"], result["ns_per_node"],
+        result["peak_memory"])
+
+
+def save(document, path):
+    with open(path, "w") as fp:
+        json.dump(document, fp, indent=2, sort_keys=True)
+
+
+def load(path):
+    with open(path) as fp:
+        return json.load(fp)
+
+
+def compare(base, current, threshold=0.1):
+    """Compare two result documents, return the regressions
+
+    A result regresses when its ops/sec drops or its peak memory grows
+    by more than threshold.
+    """
+    def key(result):
+        return (result["workload"], result["size"], result["engine"])
+
+    base_results = dict((key(r), r) for r in base["results"])
+    regressions = []
+    for result in current["results"]:
+        origin = base_results.get(key(result))
+        if origin is None:
+            continue
+        speed = result["ops_per_sec"] / origin["ops_per_sec"]
+        if speed < 1 - threshold:
+            regressions.append((key(result), "ops_per_sec", speed))
+        if result["peak_memory"] and origin["peak_memory"]:
+            memory = float(result["peak_memory"]) / origin["peak_memory"]
+            if memory > 1 + threshold:
+                regressions.append((key(result), "peak_memory", memory))
+    return regressions
+
+
+JSONLINES_SCHEMA = {
+    "type": "dict",
+    "properties": {
+        "uid": "integer",
+        "name": "string",
+        "score": "number",
+        "tags": {"type": "array", "items": "string"},
+    },
+}
+
+
+def naive_jsonlines(schema, input_path, output_path):
+    """The per line loop the CLI replaces
+    """
+    with open(input_path) as src, open(output_path, "w") as dst:
+        for line in src:
+            dst.write(json.dumps(convert_by_schema(json.loads(line), schema)))
+            dst.write("\n")
+
+
+def run_jsonlines(records=100000, workers=None, compiled=False, log=None):
+    """Time the JSON-Lines CLI against the naive loop
+    """
+    from schemaconvertor.cli import convert_file
+
+    directory = tempfile.mkdtemp()
+    try:
+        input_path = os.path.join(directory, "input.jsonl")
+        with open(input_path, "w") as fp:
+            for i in range(records):
+                fp.write(json.dumps({
+                    "uid": str(i), "name": i, "score": "%d.5" % i,
+                    "tags": [i, "tag"], "ignored": None,
+                }) + "\n")
+
+        outputs = []
+        result = {"records": records, "workers": workers}
+        for name, func, kwargs in [
+                ("naive", naive_jsonlines, {}),
+                ("cli", convert_file,
+                 {"workers": workers, "compiled": compiled})]:
+            output_path = os.path.join(directory, name + ".jsonl")
+            start = default_timer()
+            func(JSONLINES_SCHEMA, input_path, output_path, **kwargs)
+            seconds = default_timer() - start
+            result[name + "_records_per_sec"] = records / seconds
+            if log is not None:
+                log("%-6s %10.1f records/s" % (name, records / seconds))
+            with open(output_path) as fp:
+                outputs.append(fp.read())
+        result["same_output"] = outputs[0] == outputs[1]
+        return result
+    finally:
+        shutil.rmtree(directory)
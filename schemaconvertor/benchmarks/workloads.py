@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+from datetime import datetime
+from collections import namedtuple
+
+Workload = namedtuple("Workload", ["name", "schema", "build"])
+
+
+class User(object):
+
+    def __init__(self, uid):
+        self.uid = uid
+        self.name = "user%d" % uid
+        self.email = "user%d@example.com" % uid
+        self.score = uid * 0.5
+
+
+class Admin(User):
+
+    def __init__(self, uid):
+        super(Admin, self).__init__(uid)
+        self.wid = uid
+
+
+WIDE_FIELDS = ["field%d" % i for i in range(50)]
+Wide = namedtuple("Wide", WIDE_FIELDS)
+DEEP_LEVELS = 20
+
+
+def array_of(items):
+    return {"type": "array", "items": items}
+
+
+def _deep_schema(levels):
+    schema = "integer"
+    for _ in range(levels):
+        schema = {
+            "type": "dict",
+            "properties": {"value": "string", "child": schema},
+        }
+    return schema
+
+
+def _deep_data(levels, leaf):
+    data = leaf
+    for level in range(levels):
+        data = {"value": level, "child": data}
+    return data
+
+
+USERSCHEMA = {
+    "type": "object",
+    "properties": {
+        "uid": "integer",
+        "name": "string",
+        "email": "string",
+        "score": "number",
+    },
+}
+
+WORKLOADS = [
+    Workload(
+        "string", array_of("string"),
+        lambda size: [u"value%d" % i if i % 2 else b"bytes"
+                      for i in range(size)]),
+    Workload(
+        "integer", array_of("integer"),
+        lambda size: [str(i) if i % 2 else i for i in range(size)]),
+    Workload(
+        "float", array_of("float"),
+        lambda size: [i * 0.5 for i in range(size)]),
+    Workload(
+        "number", array_of("number"),
+        lambda size: [i if i % 2 else "%d.5" % i for i in range(size)]),
+    Workload(
+        "boolean", array_of("boolean"),
+        lambda size: [i % 3 for i in range(size)]),
+    Workload(
+        "null", array_of("null"),
+        lambda size: list(range(size))),
+    Workload(
+        "raw", array_of("raw"),
+        lambda size: list(range(size))),
+    Workload(
+        "dict", array_of({
+            "type": "dict",
+            "properties": {"key": "string", "value": "integer"},
+        }),
+        lambda size: [{"key": i, "value": i} for i in range(size)]),
+    Workload(
+        "object", array_of(USERSCHEMA),
+        lambda size: [User(i) for i in range(size)]),
+    Workload(
+        "array", array_of(array_of("integer")),
+        lambda size: [[i, i + 1, i + 2] for i in range(size)]),
+    Workload(
+        "typeOf", array_of({
+            "typeOf": {
+                Admin: dict(USERSCHEMA, properties=dict(
+                    USERSCHEMA["properties"], wid="integer")),
+                User: USERSCHEMA,
+                (int, float): "number",
+                "default": "string",
+            },
+        }),
+        lambda size: [
+            (User, Admin, int, str)[i % 4](i) for i in range(size)]),
+    Workload(
+        "patternProperties", {
+            "type": "dict",
+            "patternProperties": {
+                r"^\w+_cnt$": "integer",
+                r"^\w+_val$": "number",
+                r"^[a-z]+$": "string",
+            },
+        },
+        lambda size: dict(
+            ("key%d_%s" % (i, ("cnt", "val", "x")[i % 3]), i)
+            for i in range(size))),
+    Workload(
+        "hooks", array_of({
+            "type": "string",
+            "hook": {
+                "pre-convert": ["func_result", "format_date"],
+                "post-convert": [lambda data, schema: data[:10]],
+            },
+        }),
+        lambda size: [
+            (lambda: datetime(2016, 1, 1)) for _ in range(size)]),
+    Workload(
+        "wide", array_of({
+            "type": "object",
+            "properties": dict((f, "string") for f in WIDE_FIELDS),
+        }),
+        lambda size: [
+            Wide(*range(i, i + len(WIDE_FIELDS)))
+            for i in range(max(1, size // len(WIDE_FIELDS)))]),
+    Workload(
+        "deep", array_of(_deep_schema(DEEP_LEVELS)),
+        lambda size: [
+            _deep_data(DEEP_LEVELS, i)
+            for i in range(max(1, size // DEEP_LEVELS))]),
+]
+
+
+def get_workloads(names=None):
+    """Get workloads by names, all of them by default
+    """
+    if not names:
+        return list(WORKLOADS)
+    workloads = dict((w.name, w) for w in WORKLOADS)
+    return [workloads[name] for name in names]
@@ -8,3 +8,11 @@ def format_date(dt, schema):
 
 def func_result(data, schema):
     return data()
+
+
+def format_dates(dts, schema):
+    return [dt.isoformat() for dt in dts]
+
+
+def func_results(data, schema):
+    return [func() for func in data]
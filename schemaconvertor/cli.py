@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""Convert JSON-Lines by schema
+
+    python -m schemaconvertor schema.json input.jsonl -o output.jsonl -j 4
+    python -m schemaconvertor mypackage.schemas:USER - < in.jsonl > out.jsonl
+"""
+
+import os
+import sys
+import json
+import mmap
+import argparse
+import importlib
+from timeit import default_timer
+
+from schemaconvertor.convertor import SchemaConvertor
+from schemaconvertor import parallel
+from schemaconvertor.parallel import get_context, check_picklable
+
+BLOCK_SIZE = 1 << 20
+
+
+def load_schema(spec):
+    """Load a schema from a JSON file or a `module:attribute` reference
+    """
+    if os.path.exists(spec):
+        with open(spec) as fp:
+            return json.load(fp)
+    module, sep, attribute = spec.partition(":")
+    if not sep:
+        raise ValueError("no schema file or module:attribute %s" % spec)
+    return getattr(importlib.import_module(module), attribute)
+
+
+def iter_blocks(fp, block_size=BLOCK_SIZE):
+    """Read fp in blocks, yield lists of the complete non-empty lines
+    """
+    rest = b""
+    while True:
+        block = fp.read(block_size)
+        if not block:
+            break
+        lines = (rest + block).split(b"\n")
+        rest = lines.pop()
+        lines = [line for line in lines if line.strip()]
+        if lines:
+            yield lines
+    if rest.strip():
+        yield [rest]
+
+
+def open_input(path):
+    """Open path for reading, plain files are memory mapped
+    """
+    if path == "-":
+        return getattr(sys.stdin, "buffer", sys.stdin)
+    fp = open(path, "rb")
+    try:
+        if os.fstat(fp.fileno()).st_size > 0:
+            return mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+    except (ValueError, OSError, mmap.error):
+        pass
+    return fp
+
+
+def open_output(path):
+    if path == "-":
+        return getattr(sys.stdout, "buffer", sys.stdout)
+    return open(path, "wb")
+
+
+def convert_lines(cvtr, lines):
+    """Convert JSON lines, return the output block
+    """
+    return "".join(
+        json.dumps(cvtr(json.loads(line))) + "\n" for line in lines
+    ).encode("utf-8")
+
+
+def _convert_block(lines):
+    return len(lines), convert_lines(parallel._worker_convertor, lines)
+
+
+def convert_stream(schema, input_fp, output_fp, workers=None,
+                   block_size=BLOCK_SIZE, compiled=False, context=None):
+    """Convert JSON-Lines from input_fp to output_fp in order, return
+    the number of records
+
+    Blocks are converted in worker processes unless workers is 1.
+    """
+    options = {"compiled": compiled}
+    blocks = iter_blocks(input_fp, block_size)
+    records = 0
+    if workers == 1:
+        cvtr = SchemaConvertor(schema, **options)
+        for lines in blocks:
+            output_fp.write(convert_lines(cvtr, lines))
+            records += len(lines)
+        return records
+
+    context = get_context(context)
+    check_picklable(schema, context)
+    pool = context.Pool(workers, parallel._init_worker, (schema, options))
+    try:
+        for count, chunk in pool.imap(_convert_block, blocks):
+            output_fp.write(chunk)
+            records += count
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+    return records
+
+
+def convert_file(schema, input_path, output_path, **kwargs):
+    """Convert a JSON-Lines file, return the number of records
+    """
+    input_fp = open_input(input_path)
+    output_fp = open_output(output_path)
+    try:
+        return convert_stream(schema, input_fp, output_fp, **kwargs)
+    finally:
+        if input_path != "-":
+            input_fp.close()
+        if output_path != "-":
+            output_fp.close()
+        else:
+            output_fp.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m schemaconvertor",
+        description="convert JSON-Lines records by schema")
+    parser.add_argument(
+        "schema", help="JSON schema file or module:attribute")
+    parser.add_argument(
+        "input", nargs="?", default="-", help="JSON-Lines input, - for stdin")
+    parser.add_argument(
+        "-o", "--output", default="-", help="JSON-Lines output, - for stdout")
+    parser.add_argument(
+        "-j", "--workers", type=int, default=None,
+        help="worker processes, 1 converts in this process")
+    parser.add_argument("--block-size", type=int, default=BLOCK_SIZE)
+    parser.add_argument(
+        "--compiled", action="store_true", help="use the compiled engine")
+    parser.add_argument(
+        "-q", "--quiet", action="store_true", help="no throughput report")
+    args = parser.parse_args(argv)
+
+    start = default_timer()
+    records = convert_file(
+        load_schema(args.schema), args.input, args.output,
+        workers=args.workers, block_size=args.block_size,
+        compiled=args.compiled)
+    seconds = default_timer() - start
+    if not args.quiet:
+        seconds = max(seconds, 1e-9)
+        report = "%d records in %.3fs, %.1f records/s" % (
+            records, seconds, records / seconds)
+        if args.input != "-":
+            report += ", %.1f MB/s" % (
+                os.path.getsize(args.input) / seconds / (1 << 20))
+        sys.stderr.write(report + "\n")
+    return 0
@@ -0,0 +1,368 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import itertools
+
+from schemaconvertor.convertor import (
+    SchemaConst, ObjectShape, Types, unicode, FLOAT_EXACT_MAX, exact_int)
+
+
+def _type_emitter(type_):
+    """Type emitter builder
+    """
+
+    def _base_emitter(self, schema, src, lines, indent):
+        """Emit a call of given type
+        """
+        return "%s(%s)" % (self.const(type_), src)
+    return _base_emitter
+
+
+class SchemaCompiler(object):
+    """Generate one specialized python function for a schema tree
+
+    The generated function gives the same results as
+    `SchemaConvertor._convertor`, but property access, type coercion and
+    hook calls are inlined, so there is no dispatch at convert time.
+    Nodes with sub schemas referenced more than once, such as `$ref`
+    targets and recursive nodes, get functions of their own.
+    """
+    FUNC_PREFIX = "_convert_"
+    # python refuses too many statically nested blocks, so deep subtrees
+    # are moved into functions of their own
+    MAX_BLOCKS = 10
+
+    def __init__(self, schema, lazy=False, code_cache=None):
+        self.schema = schema
+        self.lazy = lazy
+        self.code_cache = code_cache
+        self.namespace = {}
+        self.functions = []
+        self.counter = itertools.count()
+        self.consts = {}
+        self.blocks = 0
+        self.shared = self.shared_schemas(schema)
+        self.shared_functions = {}
+
+    @staticmethod
+    def shared_schemas(schema):
+        """Find the nodes with sub schemas referenced more than once
+        """
+        refs = {schema: 1}
+        schemas = [schema]
+        while schemas:
+            for sch in schemas.pop().subschemas():
+                if sch in refs:
+                    refs[sch] += 1
+                else:
+                    refs[sch] = 1
+                    schemas.append(sch)
+        return set(
+            sch for sch, count in refs.items()
+            if count > 1 and sch.subschemas())
+
+    def generate(self):
+        """Generate the source code, return the entry function name
+        """
+        entry = self.function(self.schema)
+        return entry, "\n\n".join("\n".join(f) for f in self.functions)
+
+    def compile(self):
+        """Compile schema to a function
+        """
+        entry, source = self.generate()
+        filename = "<schema %s>" % self.schema
+        if self.code_cache is None:
+            code = compile(source, filename, "exec")
+        else:
+            code = self.code_cache.code(source, filename)
+        exec(code, self.namespace)
+        func = self.namespace[entry]
+        func.source = source
+        return func
+
+    def name(self, prefix):
+        return "%s%d" % (prefix, next(self.counter))
+
+    def const(self, obj):
+        """Bind obj to the generated code namespace
+        """
+        name = self.consts.get(id(obj))
+        if name is None:
+            name = self.name("c")
+            self.consts[id(obj)] = name
+            self.namespace[name] = obj
+        return name
+
+    def literal(self, value):
+        if type(value) in (str, unicode, int):
+            return repr(value)
+        return self.const(value)
+
+    def function(self, schema):
+        """Emit a top level function for schema
+        """
+        func = self.name(self.FUNC_PREFIX)
+        if schema in self.shared:
+            # registered first, so recursive nodes call themselves
+            self.shared_functions[schema] = func
+        lines = ["def %s(d):" % func]
+        blocks, self.blocks = self.blocks, 0
+        result = self.inline(schema, "d", lines, 1)
+        self.blocks = blocks
+        lines.append("    return %s" % result)
+        self.functions.append(lines)
+        return func
+
+    def node(self, schema, src, lines, indent):
+        """Emit code converting variable src, return result expression
+        """
+        if schema in self.shared or self.blocks >= self.MAX_BLOCKS:
+            result = self.name("r")
+            func = self.shared_functions.get(schema) or self.function(schema)
+            self.emit(lines, indent, "%s = %s(%s)" % (result, func, src))
+            return result
+        return self.inline(schema, src, lines, indent)
+
+    def inline(self, schema, src, lines, indent, hooks=True):
+        """Emit the code of schema itself, hooks=False leaves out its hooks
+        """
+        emitter = self.EMITTERS.get(schema.type)
+        if emitter is None:
+            self.emit(lines, indent, "raise TypeError(%r)" % (
+                "Unknown type: %s" % schema.type))
+            return "None"
+
+        sch = self.const(schema)
+        pre_hooks = schema.pre_convert_hooks if hooks else ()
+        if pre_hooks:
+            data = self.name("d")
+            for hook in pre_hooks:
+                self.emit(lines, indent, "%s = %s(%s, %s)" % (
+                    data, self.const(hook), src, sch))
+                src = data
+
+        result = emitter(self, schema, src, lines, indent)
+
+        post_hooks = schema.post_convert_hooks if hooks else ()
+        if post_hooks:
+            value, result = result, self.name("r")
+            for hook in post_hooks:
+                self.emit(lines, indent, "%s = %s(%s, %s)" % (
+                    result, self.const(hook), value, sch))
+                value = result
+        return result
+
+    def emit(self, lines, indent, line):
+        lines.append("    " * indent + line)
+
+    def block(self, schema, src, lines, indent):
+        """Emit a nested node inside a block
+        """
+        self.blocks += 1
+        result = self.node(schema, src, lines, indent)
+        self.blocks -= 1
+        return result
+
+    def _str_emitter(self, schema, src, lines, indent):
+        if schema.encoding is None:
+            return src
+
+        result = self.name("r")
+        if schema.registry.resolve(schema.origin_schema).get(
+                SchemaConst.F_INTERN, False):
+            self.emit(lines, indent, "%s = %s(%s)" % (
+                result, self.const(schema.str_convertor), src))
+            return result
+
+        self.emit(lines, indent, "if isinstance(%s, %s):" % (
+            src, self.const(unicode)))
+        self.emit(lines, indent + 1, "%s = %s" % (result, src))
+        self.emit(lines, indent, "elif isinstance(%s, bytes):" % src)
+        self.emit(lines, indent + 1, "%s = %s.decode(%s, %s)" % (
+            result, src, self.literal(schema.encoding),
+            self.literal(schema.decoderrors)))
+        self.emit(lines, indent, "else:")
+        self.emit(lines, indent + 1, "%s = str(%s)" % (result, src))
+        return result
+
+    def _number_emitter(self, schema, src, lines, indent):
+        result = self.name("r")
+        self.emit(lines, indent, "if type(%s) is int:" % src)
+        self.emit(lines, indent + 1, "%s = %s" % (result, src))
+        self.emit(lines, indent, "else:")
+        self.emit(lines, indent + 1, "%s = float(%s)" % (result, src))
+        self.emit(lines, indent + 1, "if %s.is_integer():" % result)
+        self.emit(lines, indent + 2, "if %r < %s < %r:" % (
+            -FLOAT_EXACT_MAX, result, FLOAT_EXACT_MAX))
+        self.emit(lines, indent + 3, "%s = int(%s)" % (result, result))
+        self.emit(lines, indent + 2, "else:")
+        self.emit(lines, indent + 3, "%s = %s(%s, %s)" % (
+            result, self.const(exact_int), src, result))
+        return result
+
+    def _null_emitter(self, schema, src, lines, indent):
+        return "None"
+
+    def _raw_emitter(self, schema, src, lines, indent):
+        return src
+
+    def _getitem(self, src, key, isobject):
+        """Emit the item access of ObjAsDictAdapter or a dict
+        """
+        if isobject:
+            return "getattr(%s, %s, %s)" % (src, key, self.const(Missing))
+        return "%s[%s]" % (src, key)
+
+    def _mapping_emitter(self, schema, src, lines, indent, isobject=False):
+        result = self.name("r")
+        self.emit(lines, indent, "%s = {}" % result)
+
+        if schema.pattern_properties_schemas is not SchemaConst.S_DISABLED:
+            key, value = self.name("k"), self.name("v")
+            self.emit(lines, indent, "for %s in %s:" % (
+                key, "%s(type(%s)).names(%s)" % (
+                    self.const(ObjectShape.of), src, src)
+                if isobject else src))
+            matched = self.name("s")
+            self.emit(lines, indent + 1, "%s = %s(%s)" % (
+                matched, self.const(schema.pattern_matcher.match), key))
+            keyword_ = "if"
+            for sch in schema.pattern_properties_schemas.values():
+                self.emit(lines, indent + 1, "%s %s is %s:" % (
+                    keyword_, matched, self.const(sch)))
+                # values are read only once their key matches
+                self.emit(lines, indent + 2, "%s = %s" % (
+                    value, self._getitem(src, key, isobject)))
+                if isobject:
+                    self.missing(value, key, lines, indent + 2)
+                sub = self.block(sch, value, lines, indent + 2)
+                self.emit(lines, indent + 2, "%s[%s] = %s" % (
+                    result, key, sub))
+                keyword_ = "elif"
+
+        if schema.properties_schemas is not SchemaConst.S_DISABLED:
+            for key, sch in schema.properties_schemas.items():
+                value = self.name("v")
+                self.emit(lines, indent, "%s = %s" % (
+                    value, self._getitem(src, self.literal(key), isobject)))
+                if isobject:
+                    self.missing(value, self.literal(key), lines, indent)
+                sub = self.node(sch, value, lines, indent)
+                self.emit(lines, indent, "%s[%s] = %s" % (
+                    result, self.literal(key), sub))
+        return result
+
+    def missing(self, value, key, lines, indent):
+        """Emit the KeyError raised by ObjAsDictAdapter
+        """
+        self.emit(lines, indent, "if %s is %s:" % (
+            value, self.const(Missing)))
+        self.emit(lines, indent + 1, "raise KeyError(%s)" % key)
+
+    def _dict_emitter(self, schema, src, lines, indent):
+        return self._mapping_emitter(schema, src, lines, indent)
+
+    def _object_emitter(self, schema, src, lines, indent):
+        return self._mapping_emitter(schema, src, lines, indent, True)
+
+    def generator(self, schema):
+        """Emit a top level generator converting the items of an iterable
+        """
+        func = self.name(self.FUNC_PREFIX)
+        lines = ["def %s(d):" % func, "    for i in d:"]
+        blocks, self.blocks = self.blocks, 1
+        result = self.node(schema, "i", lines, 2)
+        self.blocks = blocks
+        lines.append("        yield %s" % result)
+        self.functions.append(lines)
+        return func
+
+    def _array_emitter(self, schema, src, lines, indent):
+        if self.lazy:
+            if schema.items is SchemaConst.S_DISABLED:
+                return "iter(())"
+            return "%s(%s)" % (self.generator(schema.items), src)
+
+        result = self.name("r")
+        self.emit(lines, indent, "%s = []" % result)
+        if schema.items is SchemaConst.S_DISABLED:
+            return result
+
+        items = schema.items
+        batch_hooks = items.batch_hooks \
+            if items.type in self.EMITTERS else SchemaConst.S_DISABLED
+        if batch_hooks is not SchemaConst.S_DISABLED and \
+                batch_hooks[0] is not None:
+            # the batch variants of the item hooks run over the whole list
+            sch, values = self.const(items), self.name("v")
+            self.emit(lines, indent, "%s = %s(list(%s), %s)" % (
+                values, self.const(batch_hooks[0]), src, sch))
+            src = values
+
+        item, append = self.name("i"), self.name("a")
+        self.emit(lines, indent, "%s = %s.append" % (append, result))
+        self.emit(lines, indent, "for %s in %s:" % (item, src))
+        if batch_hooks is SchemaConst.S_DISABLED:
+            sub = self.block(items, item, lines, indent + 1)
+        else:
+            self.blocks += 1
+            sub = self.inline(items, item, lines, indent + 1, hooks=False)
+            self.blocks -= 1
+        self.emit(lines, indent + 1, "%s(%s)" % (append, sub))
+
+        if batch_hooks is not SchemaConst.S_DISABLED and \
+                batch_hooks[1] is not None:
+            self.emit(lines, indent, "%s = %s(%s, %s)" % (
+                result, self.const(batch_hooks[1]), result, self.const(items)))
+        return result
+
+    def _auto_type_emitter(self, schema, src, lines, indent):
+        if schema.typeof_schemas is SchemaConst.S_DISABLED:
+            return "None"
+
+        branches = list(schema.typeof_schemas.items())
+        if not branches:
+            return self.node(schema.typeof_default_schema, src, lines, indent)
+
+        result, matched = self.name("r"), self.name("s")
+        self.emit(lines, indent, "%s = %s.get(type(%s))" % (
+            matched, self.const(schema.typeof_cache), src))
+        self.emit(lines, indent, "if %s is None:" % matched)
+        self.emit(lines, indent + 1, "%s = %s(%s)" % (
+            matched, self.const(schema.typeof), src))
+
+        for index, (_, sch) in enumerate(branches):
+            self.emit(lines, indent, "%s %s is %s:" % (
+                "if" if index == 0 else "elif", matched, self.const(sch)))
+            sub = self.block(sch, src, lines, indent + 1)
+            self.emit(lines, indent + 1, "%s = %s" % (result, sub))
+        self.emit(lines, indent, "else:")
+        sub = self.block(schema.typeof_default_schema, src, lines, indent + 1)
+        self.emit(lines, indent + 1, "%s = %s" % (result, sub))
+        return result
+
+    EMITTERS = {
+        SchemaConst.T_STR: _str_emitter,
+        SchemaConst.T_INT: _type_emitter(Types.IntType),
+        SchemaConst.T_FLOAT: _type_emitter(Types.FloatType),
+        SchemaConst.T_BOOL: _type_emitter(Types.BooleanType),
+        SchemaConst.T_NUM: _number_emitter,
+        SchemaConst.T_DICT: _dict_emitter,
+        SchemaConst.T_OBJ: _object_emitter,
+        SchemaConst.T_LIST: _array_emitter,
+        SchemaConst.T_NULL: _null_emitter,
+        SchemaConst.T_RAW: _raw_emitter,
+        None: _auto_type_emitter,
+    }
+
+
+class Missing(object):
+    """Sentinel of missing attributes
+    """
+
+
+def compile_schema(schema, lazy=False, code_cache=None):
+    """Compile a schema tree to a single function
+    """
+    return SchemaCompiler(schema, lazy, code_cache).compile()
@@ -2,7 +2,14 @@
 # encoding: utf-8
 
 import re
-import collections
+import sys
+import weakref
+import itertools
+import operator
+import functools
+import threading
+from timeit import default_timer
+from collections import OrderedDict, namedtuple
 
 from schemaconvertor import builtin_hooks
 
@@ -11,6 +18,11 @@ try:
 except NameError:
     unicode = str
 
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
 
 class Types:
     NoneType = type(None)
@@ -35,9 +47,102 @@ def _type_convertor(type_):
 SchemaVersionError = type("SchemaVersionError", (ValueError,), {})
 FieldTypeError = type("FieldTypeError", (TypeError,), {})
 FieldMissError = type("FieldMissError", (KeyError,), {})
+SchemaRefError = type("SchemaRefError", (FieldMissError,), {})
+CircularReferenceError = type("CircularReferenceError", (ValueError,), {})
+ConvertLimitError = type("ConvertLimitError", (ValueError,), {})
+
+SchemaCompileReport = namedtuple("SchemaCompileReport", ["nodes", "seconds"])
+
+INTERN_MAX_LENGTH = 64
+INTERN_TABLE_SIZE = 1 << 16
+try:
+    _intern = sys.intern
+except AttributeError:
+    # intern of python 2 refuses unicode
+    _interned = {}
+
+    def _intern(data):
+        if len(_interned) >= INTERN_TABLE_SIZE:
+            _interned.clear()
+        return _interned.setdefault(data, data)
+
+STRING_TYPES = (unicode, bytes)
+
+
+def _identity(data):
+    return data
+
+
+# floats at least this large may have been rounded from the input
+FLOAT_EXACT_MAX = float(2 ** 53)
+
+
+def exact_int(data, num):
+    """Get the int of data whose float num is integral but too large to
+    be exact
+    """
+    if type(data) is not Types.FloatType:
+        try:
+            value = int(data)
+        except (TypeError, ValueError, OverflowError):
+            pass
+        else:
+            # int() of a string only accepts integer literals
+            if isinstance(data, STRING_TYPES) or value == data:
+                return value
+            # data is not integral, its float is rounded to an integer
+            return num
+    return int(num)
+
 
+def to_number(data):
+    """Convert data to an int when it is integral, a float otherwise,
+    integers above 2**53 keep their precision
+    """
+    if type(data) is Types.IntType:
+        return data
+    num = float(data)
+    if num.is_integer():
+        if -FLOAT_EXACT_MAX < num < FLOAT_EXACT_MAX:
+            return int(num)
+        return exact_int(data, num)
+    return num
 
-class ObjAsDictAdapter(collections.Mapping):
+
+def _build_str_convertor(encoding, decoderrors, interned=False):
+    """String convertor builder, exact types are checked first
+    """
+    if encoding is None:
+        return _identity
+
+    def _convertor(data):
+        """Convert data to unicode string
+        """
+        type_ = type(data)
+        if type_ is unicode:
+            return data
+        if type_ is bytes:
+            return data.decode(encoding, decoderrors)
+        if not isinstance(data, STRING_TYPES):
+            return str(data)
+        if isinstance(data, unicode):
+            return data
+        return data.decode(encoding, decoderrors)
+
+    if not interned:
+        return _convertor
+
+    def _interned_convertor(data):
+        """Convert data to unicode string, short strings are interned
+        """
+        data = _convertor(data)
+        if type(data) is unicode and len(data) <= INTERN_MAX_LENGTH:
+            return _intern(data)
+        return data
+    return _interned_convertor
+
+
+class ObjAsDictAdapter(Mapping):
 
     def __init__(self, obj):
         self.__object = obj
@@ -58,6 +163,238 @@ class ObjAsDictAdapter(collections.Mapping):
         return len(dir(self.__object))
 
 
+class ObjectShape(object):
+    """Attribute access specialized for one class
+
+    Shapes are built once per class, `names` gives the same list as
+    `dir(obj)`, and `getter` reads a fixed list of attributes at once.
+    """
+    NAMES_CACHE_SIZE = 64
+    _shapes = weakref.WeakKeyDictionary()
+
+    def __init__(self, cls):
+        self.cls = cls
+        self.class_names = dir(cls)
+        # namedtuple and __slots__ instances have no attribute of their own,
+        # the __dict__ of namedtuple is a property on python 2
+        instance_dict = next((
+            vars(base)["__dict__"] for base in getattr(cls, "__mro__", ())
+            if "__dict__" in vars(base)), None)
+        self.slotted = instance_dict is None or \
+            isinstance(instance_dict, property)
+        self.custom_dir = \
+            getattr(cls, "__dir__", None) is not getattr(object, "__dir__", None)
+        self.fields = getattr(cls, "_fields", None) \
+            if issubclass(cls, tuple) else None
+        self.names_cache = {}
+
+    @classmethod
+    def of(cls, type_):
+        """Get the shape of a class
+        """
+        shape = cls._shapes.get(type_)
+        if shape is None:
+            shape = cls._shapes[type_] = cls(type_)
+        return shape
+
+    def names(self, obj):
+        """Attribute names of obj, the same as dir(obj)
+        """
+        if self.custom_dir:
+            return dir(obj)
+        if self.slotted:
+            return self.class_names
+
+        attrs = tuple(obj.__dict__)
+        names = self.names_cache.get(attrs)
+        if names is None:
+            if len(self.names_cache) >= self.NAMES_CACHE_SIZE:
+                self.names_cache.clear()
+            names = self.names_cache[attrs] = sorted(
+                set(self.class_names).union(attrs))
+        return names
+
+    def getter(self, names):
+        """Build a function reading names from an object as a tuple
+        """
+        names = tuple(names)
+        if not names:
+            return lambda obj: ()
+
+        if self.fields is not None and set(names) <= set(self.fields):
+            fast_getter = operator.itemgetter(
+                *(self.fields.index(n) for n in names))
+        else:
+            fast_getter = operator.attrgetter(*names)
+        if len(names) == 1:
+            single_getter = fast_getter
+            fast_getter = lambda obj: (single_getter(obj),)
+
+        def _getter(obj):
+            try:
+                return fast_getter(obj)
+            except AttributeError:
+                return tuple(self.getattr(obj, n) for n in names)
+        return _getter
+
+    @staticmethod
+    def getattr(obj, name):
+        """Get attribute like ObjAsDictAdapter
+        """
+        try:
+            return getattr(obj, name)
+        except AttributeError:
+            raise KeyError(name)
+
+
+class PatternMatcher(object):
+    """Resolve patternProperties of a key in a single regex match
+
+    Patterns are merged into one alternation of lookaheads, every
+    alternative scans the whole key like `re.search`, so the first
+    pattern in declaration order matching anywhere in the key wins. This
+    is the same precedence as trying the patterns one by one. Patterns
+    that can not be merged (backreferences, scoped flags) fall back to
+    one search per pattern. Results are memoized per key.
+    """
+    MEMO_SIZE = 4096
+    GROUP_PREFIX = "_schemaconvertor_pattern_"
+    BACKREFREX = re.compile(r"\\[1-9]|\(\?P=")
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        self.memo = {}
+        self.combined = self.combine(self.patterns)
+        self.group_schemas = {} if self.combined is None else {
+            self.combined.groupindex["%s%d" % (self.GROUP_PREFIX, i)]: sch
+            for i, (_, sch) in enumerate(self.patterns)
+        }
+
+    def combine(self, patterns):
+        """Merge patterns into one regex, None if they can not be merged
+        """
+        if not patterns:
+            return None
+        parts = []
+        for index, (rex, _) in enumerate(patterns):
+            if rex.flags & ~re.UNICODE or \
+                    not isinstance(rex.pattern, (str, unicode)) or \
+                    self.BACKREFREX.search(rex.pattern):
+                return None
+            # anchored patterns need not scan the key
+            scan = "" if rex.pattern.startswith(("^", r"\A")) and \
+                "|" not in rex.pattern else r"[\s\S]*?"
+            parts.append(r"(?=%s(?:%s))(?P<%s%d>)" % (
+                scan, rex.pattern, self.GROUP_PREFIX, index))
+        try:
+            return re.compile("|".join(parts))
+        except re.error:
+            return None
+
+    def match(self, name):
+        """Get the schema of the first pattern matching name
+        """
+        sch = self.memo.get(name, self)
+        if sch is not self:
+            return sch
+
+        if self.combined is not None:
+            matched = self.combined.match(name)
+            sch = SchemaConst.S_UNDEFINED if matched is None \
+                else self.group_schemas[matched.lastindex]
+        else:
+            sch = SchemaConst.S_UNDEFINED
+            for rex, real_schema in self.patterns:
+                if rex.search(name):
+                    sch = real_schema
+                    break
+
+        if len(self.memo) >= self.MEMO_SIZE:
+            self.memo.clear()
+        self.memo[name] = sch
+        return sch
+
+
+class MaskedPatternMatcher(object):
+    """PatternMatcher of a masked node, names out of the mask never match
+    """
+
+    def __init__(self, matcher, mask):
+        self.matcher = matcher
+        self.mask = mask
+        self.views = {}
+
+    def match(self, name):
+        if name not in self.mask.children:
+            return SchemaConst.S_UNDEFINED
+        sch = self.matcher.match(name)
+        if not sch:
+            return sch
+        view = self.views.get(name)
+        if view is None:
+            view = self.views[name] = sch.masked(self.mask.children[name])
+        return view
+
+
+class FieldMask(object):
+    """Fields to convert, such as ["name", "email", "owners.name"]
+
+    A field selects its whole value, nested fields are joined by dots and
+    pass through arrays and typeOf. Masks are hashable by their content.
+    """
+    SEPARATOR = "."
+
+    def __init__(self, fields):
+        tree = fields if isinstance(fields, dict) else self.parse(fields)
+        self.children = {
+            name: None if sub is None else FieldMask(sub)
+            for name, sub in tree.items()
+        }
+        self.key = tuple(sorted(
+            (name, None if sub is None else sub.key)
+            for name, sub in self.children.items()))
+
+    @classmethod
+    def parse(cls, fields):
+        """Parse dotted fields into a tree of dicts, None selects all
+        """
+        tree = {}
+        for field in fields:
+            node = tree
+            names = field.split(cls.SEPARATOR)
+            for name in names[:-1]:
+                if name in node and node[name] is None:
+                    break
+                node = node.setdefault(name, {})
+            else:
+                node[names[-1]] = None
+        return tree
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __eq__(self, other):
+        return isinstance(other, FieldMask) and self.key == other.key
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return "%s(%r)" % (self.__class__.__name__, self.fields())
+
+    def fields(self):
+        """Get the dotted fields of the mask
+        """
+        fields = []
+        for name, sub in sorted(self.children.items()):
+            if sub is None:
+                fields.append(name)
+            else:
+                fields.extend(
+                    name + self.SEPARATOR + f for f in sub.fields())
+        return fields
+
+
 class SchemaConst(object):
     # schema types
     T_STR = "string"
@@ -86,16 +423,36 @@ class SchemaConst(object):
     F_HOOK = "hook"
     F_HOOK_PRECONVERT = "pre-convert"
     F_HOOK_POSTCONVERT = "post-convert"
+    F_HOOK_CONCURRENT = "concurrent"
+    F_REF = "$ref"
+    F_DEFINITIONS = "definitions"
+    F_INTERN = "intern"
 
     # field states
     S_UNDEFINED = None
     S_DISABLED = frozenset()
+    S_NO_HOOKS = ()
 
     # const values
     V_ENCODING = "utf-8"
     V_DECODERR = "strict"
 
 
+def _chain_hooks(hooks):
+    """Fuse a hook chain into one callable, None for no hooks
+    """
+    if not hooks:
+        return None
+    if len(hooks) == 1:
+        return hooks[0]
+
+    def _chain(data, schema):
+        for hook in hooks:
+            data = hook(data, schema)
+        return data
+    return _chain
+
+
 class SchemaBuiltinHook(object):
     Pre_Convert_Hook = {
         "format_date": builtin_hooks.format_date,
@@ -103,30 +460,124 @@ class SchemaBuiltinHook(object):
     }
     Post_Convert_Hook = {
     }
+    # hook: variant converting the list of values of a whole array
+    Batch_Hook = {
+        builtin_hooks.format_date: builtin_hooks.format_dates,
+        builtin_hooks.func_result: builtin_hooks.func_results,
+    }
+
+    @staticmethod
+    def resolve(hooks, hook):
+        """Resolve a builtin hook name, callables are returned as is
+        """
+        if isinstance(hook, (str, unicode)):
+            return hooks.get(hook, hook)
+        return hook
+
+    @classmethod
+    def stage_hooks(cls, stage):
+        """Get the builtin hooks of stage
+        """
+        if stage == SchemaConst.F_HOOK_PRECONVERT:
+            return cls.Pre_Convert_Hook
+        if stage == SchemaConst.F_HOOK_POSTCONVERT:
+            return cls.Post_Convert_Hook
+        raise ValueError("Unknown hook stage: %s" % stage)
+
+    @classmethod
+    def register(cls, name, func, stage=SchemaConst.F_HOOK_PRECONVERT,
+                 batch=None):
+        """Register func as builtin hook name of stage
+
+        batch(values, schema) is the optional variant taking the list of
+        values of a whole array, it returns the list of results.
+        Schemas compiled earlier keep the hooks they resolved.
+        """
+        cls.stage_hooks(stage)[name] = func
+        if batch is not None:
+            cls.Batch_Hook[func] = batch
+
+    @classmethod
+    def unregister(cls, name, stage=SchemaConst.F_HOOK_PRECONVERT):
+        """Remove builtin hook name of stage, return its function
+        """
+        func = cls.stage_hooks(stage).pop(name)
+        if func not in cls.Pre_Convert_Hook.values() and \
+                func not in cls.Post_Convert_Hook.values():
+            cls.Batch_Hook.pop(func, None)
+        return func
+
+    @classmethod
+    def batch(cls, hooks):
+        """Fuse the batch variants of hooks, None for no hooks and
+        S_DISABLED when a hook has no batch variant
+        """
+        try:
+            return _chain_hooks(tuple(cls.Batch_Hook[hook] for hook in hooks))
+        except (KeyError, TypeError):
+            return SchemaConst.S_DISABLED
 
 
 class Schema(object):
+    """Schema node, compiled lazily on first attribute access
+
+    Compiled nodes are slotted and read-only, disabled fields and empty
+    hook lists share the singletons of SchemaConst.
+    """
     VERSION = __version__
     VERVERIFYREX = re.compile(r"0\.[1-3]\.*")
 
-    def __init__(self, schema, parent=None):
+    __slots__ = (
+        "origin_schema", "parent", "registry", "version", "description",
+        "compiled",
+        "type", "items", "properties_schemas", "typeof_schemas",
+        "typeof_default_schema", "typeof_cache",
+        "pattern_properties_schemas", "pattern_matcher",
+        "encoding", "decoderrors", "str_convertor", "object_getters",
+        "pre_convert_hooks", "post_convert_hooks", "concurrent_hooks",
+        "pre_convert_chain", "post_convert_chain", "batch_hooks",
+    )
+
+    def __init__(self, schema, parent=None, shared=True):
         if isinstance(schema, (str, unicode)):
             schema = {"type": schema}
 
+        # compiled must be set first, it is checked by __setattr__
+        super(Schema, self).__setattr__("compiled", False)
         self.origin_schema = schema
         self.parent = parent
+        self.registry = parent.registry if parent else \
+            SchemaRegistry(schema, shared)
         self.version = schema.get(
             SchemaConst.F_VERSION,
             parent.version if parent else self.VERSION)
         self.description = str(schema.get(
             SchemaConst.F_DESCRIPTION,
             parent.description if parent else self.__class__))
-        self.compiled = False
 
     def __getattr__(self, name):
         self.compile()
         return super(Schema, self).__getattribute__(name)
 
+    def __setattr__(self, name, value):
+        if self.compiled:
+            raise AttributeError("compiled schema is read-only")
+        super(Schema, self).__setattr__(name, value)
+
+    def __delattr__(self, name):
+        if self.compiled:
+            raise AttributeError("compiled schema is read-only")
+        super(Schema, self).__delattr__(name)
+
+    @property
+    def hooks(self):
+        """Hooks by stage
+        """
+        return {
+            SchemaConst.F_HOOK_PRECONVERT: self.pre_convert_hooks,
+            SchemaConst.F_HOOK_POSTCONVERT: self.post_convert_hooks,
+        }
+
     def __repr__(self):
         return "%s(%r)" % (self.__class__.__name__, self.origin_schema)
 
@@ -134,60 +585,107 @@ class Schema(object):
         return "<Schema: %s>" % self.description
 
     def compile(self):
-        """compile schema
+        """compile schema, the fields are built first and published under
+        the registry lock, threads racing on a node compile it twice
         """
         if self.compiled:
             return
 
         schema = self.origin_schema
-        self.type = schema.get(SchemaConst.F_TYPE, SchemaConst.S_UNDEFINED)
+        parent = self.parent
+        registry = self.registry
+        if parent is None:
+            # sub schemas are resolved by subschema, the root is here
+            schema = registry.resolve(schema)
+            if isinstance(schema, (str, unicode)):
+                schema = {"type": schema}
+        fields = {}
+        schema_type = fields["type"] = schema.get(
+            SchemaConst.F_TYPE, SchemaConst.S_UNDEFINED)
+        # sub schemas are interned by the context they inherit
+        encoding = fields["encoding"] = schema.get(
+            SchemaConst.F_ENCODING,
+            parent.encoding if parent else SchemaConst.V_ENCODING)
+        decoderrors = fields["decoderrors"] = schema.get(
+            SchemaConst.F_DECODERR,
+            parent.decoderrors if parent else SchemaConst.V_DECODERR)
+        context = (self.version, self.description, encoding, decoderrors)
+        if parent is None:
+            registry.nodes.setdefault(registry.key(schema, (
+                self.VERSION, str(self.__class__),
+                SchemaConst.V_ENCODING, SchemaConst.V_DECODERR)), self)
 
         items = schema.get(SchemaConst.F_ITEMS)
-        self.items = self.subschema(items) if items else SchemaConst.S_DISABLED
+        fields["items"] = self.subschema(items, context) \
+            if items else SchemaConst.S_DISABLED
 
         properties = schema.get(SchemaConst.F_PROPERTIES)
-        self.properties_schemas = SchemaConst.S_DISABLED \
+        fields["properties_schemas"] = SchemaConst.S_DISABLED \
             if properties is None else {
-                k: self.subschema(s) for k, s in properties.items()
+                k: self.subschema(s, context) for k, s in properties.items()
             }
 
         typeof_schemas = schema.get(SchemaConst.F_TYPEOF)
-        self.typeof_schemas = SchemaConst.S_DISABLED \
+        fields["typeof_schemas"] = SchemaConst.S_DISABLED \
             if typeof_schemas is None else {
-                Types.NoneType if t is None else t: self.subschema(s)
+                Types.NoneType if t is None else t: self.subschema(s, context)
                 for t, s in typeof_schemas.items()
                 if isinstance(t, (type, tuple, Types.NoneType))
             }
-        self.typeof_default_schema = SchemaConst.S_DISABLED \
+        fields["typeof_default_schema"] = SchemaConst.S_DISABLED \
             if typeof_schemas is None else self.subschema(typeof_schemas.get(
-                SchemaConst.F_DEFAULT, SchemaConst.T_DEFAULT))
+                SchemaConst.F_DEFAULT, SchemaConst.T_DEFAULT), context)
+        fields["typeof_cache"] = SchemaConst.S_DISABLED \
+            if typeof_schemas is None else {}
 
         p_schemas = schema.get(SchemaConst.F_PATTERNPROPERTIES)
-        self.pattern_properties_schemas = SchemaConst.S_DISABLED \
+        pattern_properties_schemas = \
+            fields["pattern_properties_schemas"] = SchemaConst.S_DISABLED \
             if p_schemas is None else {
-                re.compile(p): self.subschema(s)
+                re.compile(p): self.subschema(s, context)
                 for p, s in p_schemas.items()
             }
-
-        self.encoding = schema.get(
-            SchemaConst.F_ENCODING,
-            self.parent.encoding if self.parent else SchemaConst.V_ENCODING)
-        self.decoderrors = schema.get(
-            SchemaConst.F_DECODERR,
-            self.parent.decoderrors if self.parent else SchemaConst.V_DECODERR)
-
-        self.hooks = schema.get(SchemaConst.F_HOOK, {})
-
-        self.hooks[SchemaConst.F_HOOK_PRECONVERT] = [
-            SchemaBuiltinHook.Pre_Convert_Hook.get(hook, hook)
-            for hook in self.hooks.get(SchemaConst.F_HOOK_PRECONVERT, [])
-        ]
-        self.hooks[SchemaConst.F_HOOK_POSTCONVERT] = [
-            SchemaBuiltinHook.Post_Convert_Hook.get(hook, hook)
-            for hook in self.hooks.get(SchemaConst.F_HOOK_POSTCONVERT, [])
-        ]
-
-        self.compiled = True
+        fields["pattern_matcher"] = SchemaConst.S_DISABLED \
+            if p_schemas is None else \
+            PatternMatcher(pattern_properties_schemas.items())
+
+        fields["str_convertor"] = _build_str_convertor(
+            encoding, decoderrors, schema.get(SchemaConst.F_INTERN, False)) \
+            if schema_type == SchemaConst.T_STR else SchemaConst.S_DISABLED
+        fields["object_getters"] = {} \
+            if schema_type == SchemaConst.T_OBJ else SchemaConst.S_DISABLED
+
+        hooks = schema.get(SchemaConst.F_HOOK, {})
+        pre_convert_hooks = fields["pre_convert_hooks"] = tuple(
+            SchemaBuiltinHook.resolve(SchemaBuiltinHook.Pre_Convert_Hook, hook)
+            for hook in hooks.get(SchemaConst.F_HOOK_PRECONVERT, ())
+        ) or SchemaConst.S_NO_HOOKS
+        post_convert_hooks = fields["post_convert_hooks"] = tuple(
+            SchemaBuiltinHook.resolve(
+                SchemaBuiltinHook.Post_Convert_Hook, hook)
+            for hook in hooks.get(SchemaConst.F_HOOK_POSTCONVERT, ())
+        ) or SchemaConst.S_NO_HOOKS
+        fields["concurrent_hooks"] = bool(
+            hooks.get(SchemaConst.F_HOOK_CONCURRENT, False) and
+            (pre_convert_hooks or post_convert_hooks))
+        fields["pre_convert_chain"] = _chain_hooks(pre_convert_hooks)
+        fields["post_convert_chain"] = _chain_hooks(post_convert_hooks)
+        batch_hooks = SchemaConst.S_DISABLED
+        if pre_convert_hooks or post_convert_hooks:
+            batch_hooks = (
+                SchemaBuiltinHook.batch(pre_convert_hooks),
+                SchemaBuiltinHook.batch(post_convert_hooks))
+            if SchemaConst.S_DISABLED in batch_hooks:
+                batch_hooks = SchemaConst.S_DISABLED
+        fields["batch_hooks"] = batch_hooks
+
+        with registry.lock:
+            if self.compiled:
+                return
+            publish = super(Schema, self).__setattr__
+            for name, value in fields.items():
+                publish(name, value)
+            publish("compiled", True)
 
     def check_version(self):
         """Check version if is available
@@ -214,15 +712,37 @@ class Schema(object):
                 return SchemaConst.S_UNDEFINED
             raise FieldMissError("field %s is miss" % SchemaConst.F_TYPEOF)
 
-        sch = self.typeof_schemas.get(type(data), SchemaConst.S_UNDEFINED)
-        if sch is not SchemaConst.S_UNDEFINED:
-            return sch
+        cls = type(data)
+        sch = self.typeof_cache.get(cls)
+        if sch is None:
+            sch = self.typeof_cache[cls] = self.resolve_typeof(cls, data)
+        return sch
 
-        for typ, sch in self.typeof_schemas.items():
+    def resolve_typeof(self, cls, data):
+        """Resolve sub schema of a type, the nearest class in MRO wins
+        """
+        schemas = self.typeof_schemas
+        for base in getattr(cls, "__mro__", (cls,)):
+            sch = schemas.get(base)
+            if sch is not None:
+                return sch
+            for typ, sch in schemas.items():
+                if isinstance(typ, tuple) and base in typ:
+                    return sch
+
+        # virtual subclasses, such as abstract base classes
+        for typ, sch in schemas.items():
             if isinstance(data, typ):
                 return sch
         return self.typeof_default_schema
 
+    def invalidate_typeof_cache(self):
+        """Forget resolved typeOf schemas, call it after typeof_schemas
+        is changed
+        """
+        if self.typeof_schemas is not SchemaConst.S_DISABLED:
+            self.typeof_cache.clear()
+
     def pattern_properties(self, name, istry=False):
         """Get sub schema by name pattern
         """
@@ -232,31 +752,429 @@ class Schema(object):
             raise FieldMissError(
                 "field %s is miss" % SchemaConst.F_PATTERNPROPERTIES)
 
-        for rex, sch in self.pattern_properties_schemas.items():
-            if rex.search(name):
-                return sch
-        return SchemaConst.S_UNDEFINED
+        return self.pattern_matcher.match(name)
+
+    def object_getter(self, cls):
+        """Get the function reading the properties of a cls instance, it
+        is built once per class
+        """
+        getter = self.object_getters.get(cls)
+        if getter is None:
+            getter = self.object_getters[cls] = \
+                ObjectShape.of(cls).getter(self.properties_schemas)
+        return getter
+
+    def context(self):
+        """Values the sub schemas inherit
+        """
+        return (self.version, self.description, self.encoding,
+                self.decoderrors)
+
+    def subschema(self, sch, context=None):
+        """Get the subschema, nodes of the same content and context are
+        shared
+        """
+        registry = self.registry
+        resolved = registry.resolve(sch)
+        if not registry.shared and resolved is sch:
+            # only $ref targets are shared, recursive schemas need them
+            return Schema(sch, self)
+        sch = resolved
+        key = registry.key(sch, context or self.context())
+        node = registry.nodes.get(key)
+        if node is None:
+            node = registry.nodes.setdefault(key, Schema(sch, self))
+        return node
+
+    def masked(self, mask):
+        """Get a view of this node converting only the fields of mask,
+        views are cached per mask
+        """
+        if mask is None:
+            return self
+        views = self.registry.views
+        view = views.get((self, mask))
+        if view is None:
+            if len(views) >= self.registry.VIEWS_SIZE:
+                views.clear()
+            view = views[(self, mask)] = self.mask(mask, {})
+        return view
+
+    def mask(self, mask, views):
+        """Build the masked view, views holds the views being built so
+        recursive schemas end
+        """
+        view = views.get((self, mask))
+        if view is not None:
+            return view
+
+        self.compile()
+        view = views[(self, mask)] = object.__new__(self.__class__)
+        fields = dict(
+            (name, getattr(self, name)) for name in self.__slots__)
+        if self.items is not SchemaConst.S_DISABLED:
+            fields["items"] = self.items.mask(mask, views)
+        if self.typeof_schemas is not SchemaConst.S_DISABLED:
+            fields["typeof_schemas"] = {
+                t: sch.mask(mask, views)
+                for t, sch in self.typeof_schemas.items()
+            }
+            fields["typeof_default_schema"] = \
+                self.typeof_default_schema.mask(mask, views)
+            fields["typeof_cache"] = {}
+        if self.properties_schemas is not SchemaConst.S_DISABLED:
+            children = mask.children
+            fields["properties_schemas"] = {
+                name: sch if children[name] is None
+                else sch.mask(children[name], views)
+                for name, sch in self.properties_schemas.items()
+                if name in children
+            }
+        if self.pattern_matcher is not SchemaConst.S_DISABLED:
+            fields["pattern_matcher"] = \
+                MaskedPatternMatcher(self.pattern_matcher, mask)
+        if self.object_getters is not SchemaConst.S_DISABLED:
+            fields["object_getters"] = {}
+
+        # the view is complete once compiled is set
+        fields["compiled"] = False
+        for name in self.__slots__:
+            super(Schema, view).__setattr__(name, fields[name])
+        super(Schema, view).__setattr__("compiled", True)
+        return view
+
+    def subschemas(self):
+        """Get the direct sub schemas
+        """
+        subschemas = []
+        if self.items is not SchemaConst.S_DISABLED:
+            subschemas.append(self.items)
+        for schemas in (
+                self.properties_schemas, self.typeof_schemas,
+                self.pattern_properties_schemas):
+            if schemas is not SchemaConst.S_DISABLED:
+                subschemas.extend(schemas.values())
+        if self.typeof_default_schema is not SchemaConst.S_DISABLED:
+            subschemas.append(self.typeof_default_schema)
+        return subschemas
+
+    def compile_all(self):
+        """Compile the whole schema tree up front
+        """
+        start = default_timer()
+        visited = set()
+        schemas = [self]
+        while schemas:
+            schema = schemas.pop()
+            if id(schema) in visited:
+                continue
+            visited.add(id(schema))
+            schemas.extend(schema.subschemas())
+        return SchemaCompileReport(len(visited), default_timer() - start)
+
+
+class SchemaRegistry(object):
+    """Interned nodes of one schema tree
+
+    `$ref` are JSON pointers into the root schema, such as
+    `#/definitions/User`. Identical sub schemas share one node, with
+    shared=False only the targets of `$ref` do.
+    """
+
+    VIEWS_SIZE = 256
+
+    def __init__(self, root, shared=True):
+        self.root = root
+        self.shared = shared
+        self.nodes = {}
+        self.fingerprints = {}
+        self.interned = {}
+        self.counter = itertools.count()
+        self.views = {}
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.nodes)
 
-    def subschema(self, sch):
-        """create a subschema
+    def key(self, schema, context):
+        """Key of schema inheriting context
         """
-        return Schema(sch, self)
+        return (schema_fingerprint(
+            schema, self.fingerprints, self.intern), context)
+
+    def intern(self, fingerprint):
+        """Get the small int standing for fingerprint in this registry,
+        nested tuples are hashed once instead of on every lookup
+        """
+        ident = self.interned.get(fingerprint)
+        if ident is None:
+            # next of a count is atomic, threads never share an int
+            ident = self.interned.setdefault(fingerprint, next(self.counter))
+        return ident
+
+    def lookup(self, ref):
+        """Get the schema a JSON pointer refers to
+        """
+        if not ref.startswith("#"):
+            raise SchemaRefError("only local %s is supported: %s" % (
+                SchemaConst.F_REF, ref))
+        schema = self.root
+        for token in ref[1:].split("/")[1:]:
+            token = token.replace("~1", "/").replace("~0", "~")
+            try:
+                schema = schema[token]
+            except (KeyError, TypeError, IndexError):
+                raise SchemaRefError("unresolvable %s: %s" % (
+                    SchemaConst.F_REF, ref))
+        return schema
+
+    def resolve(self, schema):
+        """Follow the $ref of schema
+        """
+        refs = set()
+        while isinstance(schema, dict) and SchemaConst.F_REF in schema:
+            ref = schema[SchemaConst.F_REF]
+            if ref in refs:
+                raise SchemaRefError("circular %s: %s" % (
+                    SchemaConst.F_REF, ref))
+            refs.add(ref)
+            schema = self.lookup(ref)
+        return schema
 
 
 class SchemaConvertor(object):
 
-    def __init__(self, schema):
+    HOOK_WINDOW = 64
+
+    def __init__(self, schema, compiled=False, lazy=False, hook_workers=None,
+                 batch=False, typed=False, memo=False, iterative=False,
+                 max_depth=None, max_nodes=None, code_cache=None):
         if not isinstance(schema, Schema):
             schema = Schema(schema)
 
         if schema.check_version() is False:
             raise SchemaVersionError()
+        if compiled and hook_workers:
+            raise ValueError(
+                "hook_workers is not supported by the compiled engine")
+        if compiled and batch:
+            raise ValueError("batch is not supported by the compiled engine")
+        if compiled and typed:
+            raise ValueError("typed is not supported by the compiled engine")
+        if compiled and memo:
+            raise ValueError("memo is not supported by the compiled engine")
+        if iterative and (
+                compiled or lazy or hook_workers or batch or typed or memo):
+            raise ValueError(
+                "iterative can not be combined with other engine options")
+        # each replaces the array convertor, only typed falls back to batch
+        if sum(map(bool, (lazy, hook_workers, batch or typed))) > 1:
+            raise ValueError(
+                "lazy, hook_workers and batch or typed can not be combined")
 
         self.schema = schema
-
-    def __call__(self, data):
+        # the options of __init__, to build the same convertor elsewhere
+        self.options = {
+            "compiled": compiled, "lazy": lazy, "hook_workers": hook_workers,
+            "batch": batch, "typed": typed, "memo": memo,
+            "iterative": iterative, "max_depth": max_depth,
+            "max_nodes": max_nodes, "code_cache": code_cache,
+        }
+        self.compiled = compiled
+        self.lazy = lazy
+        self.code_cache = code_cache
+        self.hook_workers = hook_workers
+        self.batch = batch
+        self.typed = typed
+        self.memo = memo
+        self.iterative = iterative
+        # memo reuses results per object, so hooks run item by item
+        self.batch_hooks = not memo
+        self.max_depth = sys.maxsize if max_depth is None else max_depth
+        self.max_nodes = sys.maxsize if max_nodes is None else max_nodes
+        self.hook_executor = None
+        if iterative:
+            self.leaf_convertors = {}
+            self.member_plans = {}
+            self._convertor = self._iterative_convertor
+        if memo:
+            # per call state, one convertor may be called from threads
+            self.memo_state = threading.local()
+            self._convertor = self._memo_convertor
+        if batch:
+            self.CONVERTORS = dict(self.CONVERTORS)
+            self.CONVERTORS[SchemaConst.T_LIST] = \
+                self.__class__._batch_array_convertor
+        if typed:
+            from schemaconvertor.typed import typed_array
+            self.typed_array = typed_array
+            self.untyped_array_convertor = \
+                self.CONVERTORS[SchemaConst.T_LIST]
+            self.CONVERTORS = dict(self.CONVERTORS)
+            self.CONVERTORS[SchemaConst.T_LIST] = \
+                self.__class__._typed_array_convertor
+        if hook_workers:
+            # the futures package on python 2
+            from concurrent.futures import ThreadPoolExecutor
+            # the pool is created on first use and shut down by close
+            self.hook_executor_class = ThreadPoolExecutor
+            self.hook_lock = threading.Lock()
+            self.concurrent_nodes = {}
+            self.CONVERTORS = dict(self.CONVERTORS)
+            self.CONVERTORS[SchemaConst.T_LIST] = \
+                self.__class__._concurrent_array_convertor
+            self.CONVERTORS[SchemaConst.T_DICT] = \
+                self.__class__._concurrent_dict_convertor
+            self.CONVERTORS[SchemaConst.T_OBJ] = \
+                self.__class__._concurrent_object_convertor
+        if lazy:
+            self.CONVERTORS = dict(self.CONVERTORS)
+            self.CONVERTORS[SchemaConst.T_LIST] = \
+                self.__class__._lazy_array_convertor
+        self.compiled_convertor = None
+        self.compiled_items_convertor = None
+        if compiled:
+            from schemaconvertor.compiler import compile_schema
+            self.compiled_convertor = compile_schema(schema, lazy, code_cache)
+
+    def __call__(self, data, only=None):
+        if only is not None:
+            schema = self.masked_schema(only)
+            if self.memo:
+                return self._memo_call(data, schema)
+            return self._convertor(data, schema)
+        if self.compiled_convertor is not None:
+            return self.compiled_convertor(data)
+        if self.memo:
+            return self._memo_call(data, self.schema)
         return self._convertor(data, self.schema)
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Shut down the hook_workers thread pool, it is created again
+        if the convertor is used afterwards
+        """
+        executor, self.hook_executor = self.hook_executor, None
+        if executor is not None:
+            executor.shutdown()
+
+    def _hook_submit(self):
+        """Submit of the hook_workers thread pool, created on first use
+        """
+        executor = self.hook_executor
+        if executor is None:
+            with self.hook_lock:
+                executor = self.hook_executor
+                if executor is None:
+                    executor = self.hook_executor = \
+                        self.hook_executor_class(self.hook_workers)
+        return executor.submit
+
+    def masked_schema(self, only):
+        """Get the schema view converting only the given fields, only is
+        a FieldMask or a list of dotted fields
+        """
+        if not isinstance(only, FieldMask):
+            only = FieldMask(only)
+        return self.schema.masked(only)
+
+    def _memo_call(self, data, schema):
+        """Convert data with a memo living as long as this call
+        """
+        local = self.memo_state
+        state = getattr(local, "state", None)
+        local.state = {}, set()
+        try:
+            return self._convertor(data, schema)
+        finally:
+            local.state = state
+
+    def warmup(self, *samples):
+        """Compile the schema tree up front and convert the samples to
+        fill the caches, return the compile report
+        """
+        report = self.schema.compile_all()
+        for sample in samples:
+            self(sample)
+        return report
+
+    def map_parallel(self, iterable, workers=None, chunksize=1000,
+                     fallback=False, context=None):
+        """Convert items of iterable in worker processes, return an
+        iterator of the results in order
+        """
+        from schemaconvertor.parallel import map_parallel
+        return map_parallel(
+            self, iterable, workers, chunksize, fallback, context)
+
+    def iter(self, data):
+        """Convert a root array lazily, yield the converted items
+        """
+        schema = self.schema
+        if schema.type != SchemaConst.T_LIST:
+            raise FieldTypeError(
+                "iter needs a root schema of type %s" % SchemaConst.T_LIST)
+
+        for hook in schema.pre_convert_hooks:
+            data = hook(data, schema)
+
+        real_schema = schema.items
+        if real_schema is SchemaConst.S_DISABLED:
+            result = iter(())
+        elif self.compiled:
+            if self.compiled_items_convertor is None:
+                from schemaconvertor.compiler import compile_schema
+                self.compiled_items_convertor = compile_schema(
+                    real_schema, self.lazy, self.code_cache)
+            convert = self.compiled_items_convertor
+            result = (convert(item) for item in data)
+        else:
+            result = (self._convertor(item, real_schema) for item in data)
+
+        for hook in schema.post_convert_hooks:
+            result = hook(result, schema)
+        return iter(result)
+
+    def columns(self, data):
+        """Convert a root array of dict or object items column by column,
+        return a dict of lists keyed by properties
+        """
+        schema = self.schema
+        if schema.type != SchemaConst.T_LIST or \
+                schema.post_convert_hooks or \
+                not self._batchable(schema.items):
+            raise FieldTypeError(
+                "columns needs a root schema of type %s without post-convert "
+                "hooks, its items must be %s or %s with properties only" % (
+                    SchemaConst.T_LIST, SchemaConst.T_DICT, SchemaConst.T_OBJ))
+
+        for hook in schema.pre_convert_hooks:
+            data = hook(data, schema)
+        return dict(zip(
+            schema.items.properties_schemas,
+            self._batch_columns(data, schema.items)))
+
+    def iter_encode(self, data, only=None, **kwargs):
+        """Encode data to JSON text chunks by schema, only selects fields
+        as in __call__
+        """
+        from schemaconvertor.encoder import SchemaEncoder
+        schema = None
+        if only is not None:
+            schema = self.masked_schema(only)
+        return SchemaEncoder(self, **kwargs).iterencode(data, schema)
+
+    def dump(self, data, fp, only=None, **kwargs):
+        """Write data as JSON text to file-like object fp by schema
+        """
+        for chunk in self.iter_encode(data, only, **kwargs):
+            fp.write(chunk)
+
     def _convertor(self, data, schema):
         """Main convertor
         """
@@ -264,16 +1182,213 @@ class SchemaConvertor(object):
         if convertor is None:
             raise TypeError("Unknown type: %s" % schema.type)
 
-        for hook in schema.hooks[SchemaConst.F_HOOK_PRECONVERT]:
+        hook = schema.pre_convert_chain
+        if hook is not None:
             data = hook(data, schema)
 
         result = convertor(self, data, schema)
 
-        for hook in schema.hooks[SchemaConst.F_HOOK_POSTCONVERT]:
+        hook = schema.post_convert_chain
+        if hook is not None:
             result = hook(result, schema)
 
         return result
 
+    def _iterative_convertor(self, data, schema):
+        """Main convertor driven by an explicit work stack, the depth of
+        data is not limited by the recursion limit
+        """
+        max_depth, max_nodes = self.max_depth, self.max_nodes
+        convertors = self.CONVERTORS
+        leaves, plans = self.leaf_convertors, self.member_plans
+        finish, disabled = self.FINISH, SchemaConst.S_DISABLED
+        t_list, t_dict, t_obj = \
+            SchemaConst.T_LIST, SchemaConst.T_DICT, SchemaConst.T_OBJ
+        root = [None]
+        # (data, schema, target, key, depth), the result is stored in
+        # target[key]; depth FINISH runs the post-convert hooks of data[0]
+        stack = [(data, schema, root, 0, 0)]
+        push, pop = stack.append, stack.pop
+        nodes = 0
+        while stack:
+            data, schema, target, key, depth = pop()
+            if depth == finish:
+                value = data[0]
+                for hook in schema.post_convert_hooks:
+                    value = hook(value, schema)
+                target[key] = value
+                continue
+
+            nodes += 1
+            if nodes > max_nodes:
+                raise ConvertLimitError("more than %d nodes" % max_nodes)
+            if depth > max_depth:
+                raise ConvertLimitError("deeper than %d levels" % max_depth)
+
+            for hook in schema.pre_convert_hooks:
+                data = hook(data, schema)
+
+            type_ = schema.type
+            children = ()
+            if type_ == t_list:
+                value = []
+                real_schema = schema.items
+                if real_schema is not disabled:
+                    leaf = leaves.get(real_schema)
+                    if leaf is None:
+                        leaf = self._leaf_convertor(real_schema)
+                    if leaf:
+                        # scalar items are converted in place
+                        value = [
+                            leaf(self, item, real_schema) for item in data]
+                        nodes += len(value)
+                        if value and depth >= max_depth:
+                            raise ConvertLimitError(
+                                "deeper than %d levels" % max_depth)
+                    else:
+                        value = list(data)
+                        children = [
+                            (item, real_schema, value, index, depth + 1)
+                            for index, item in enumerate(value)]
+
+            elif type_ == t_dict or type_ == t_obj:
+                value = {}
+                isobject = type_ == t_obj
+                members, children = (), []
+                if schema.properties_schemas is not disabled:
+                    plan = plans.get(schema)
+                    if plan is None:
+                        plan = self._member_plan(schema)
+                    if isobject:
+                        values = schema.object_getter(type(data))(data)
+                    else:
+                        values = map(
+                            data.__getitem__, schema.properties_schemas)
+                    if plan and depth >= max_depth:
+                        raise ConvertLimitError(
+                            "deeper than %d levels" % max_depth)
+                    members = zip(plan, values)
+
+                if schema.pattern_properties_schemas is not disabled:
+                    matched = []
+                    shape = ObjectShape.of(type(data)) if isobject else None
+                    for name in shape.names(data) if isobject else data:
+                        real_schema = schema.pattern_properties(
+                            name, istry=True)
+                        if real_schema:
+                            leaf = leaves.get(real_schema)
+                            if leaf is None:
+                                leaf = self._leaf_convertor(real_schema)
+                            matched.append(((name, real_schema, leaf), (
+                                shape.getattr(data, name) if isobject
+                                else data[name])))
+                    if matched and depth >= max_depth:
+                        raise ConvertLimitError(
+                            "deeper than %d levels" % max_depth)
+                    # the values of properties are read first, but pattern
+                    # properties come first in the output
+                    members = matched + list(members)
+
+                for (name, real_schema, leaf), real_data in members:
+                    # a deferred member must not overwrite a later one
+                    if leaf and not (children and name in value):
+                        value[name] = leaf(self, real_data, real_schema)
+                        nodes += 1
+                    else:
+                        value[name] = None
+                        children.append(
+                            (real_data, real_schema, value, name, depth + 1))
+
+            elif type_ is None:
+                real_schema = schema.typeof(data, istry=True)
+                leaf = leaves.get(real_schema)
+                undefined = real_schema is SchemaConst.S_UNDEFINED
+                if leaf is None and not undefined:
+                    leaf = self._leaf_convertor(real_schema)
+                if leaf:
+                    value = leaf(self, data, real_schema)
+                    nodes += 1
+                elif not undefined:
+                    if schema.post_convert_hooks:
+                        value = [None]
+                        push((value, schema, target, key, finish))
+                        target, key = value, 0
+                    push((data, real_schema, target, key, depth))
+                    continue
+                else:
+                    value = None
+
+            else:
+                convertor = convertors.get(type_)
+                if convertor is None:
+                    raise TypeError("Unknown type: %s" % type_)
+                value = convertor(self, data, schema)
+
+            if nodes > max_nodes:
+                raise ConvertLimitError("more than %d nodes" % max_nodes)
+            if not children or not schema.post_convert_hooks:
+                for hook in schema.post_convert_hooks:
+                    value = hook(value, schema)
+                target[key] = value
+            else:
+                push(([value], schema, target, key, finish))
+            # the last pushed is converted first
+            stack.extend(reversed(children))
+        return root[0]
+
+    def _leaf_convertor(self, schema):
+        """Get the function converting a scalar node at once, False for
+        other nodes
+        """
+        leaf = False
+        if schema.type in self.LEAF_TYPES:
+            leaf = self.CONVERTORS[schema.type]
+            if schema.pre_convert_hooks or schema.post_convert_hooks:
+                # scalar convertors do not recurse
+                leaf = self.__class__._convertor
+        self.leaf_convertors[schema] = leaf
+        return leaf
+
+    def _member_plan(self, schema):
+        """Get the (name, schema, leaf convertor) of the properties of a
+        dict or object node
+        """
+        leaves = self.leaf_convertors
+        plan = []
+        for name, real_schema in schema.properties_schemas.items():
+            leaf = leaves.get(real_schema)
+            if leaf is None:
+                leaf = self._leaf_convertor(real_schema)
+            plan.append((name, real_schema, leaf))
+        plan = self.member_plans[schema] = tuple(plan)
+        return plan
+
+    def _memo_convertor(self, data, schema):
+        """Main convertor, the result of an object is reused wherever the
+        object appears again with the same schema
+        """
+        state = getattr(self.memo_state, "state", None)
+        if state is None or type(data) in self.MEMO_SKIP_TYPES:
+            return self.__class__._convertor(self, data, schema)
+
+        results, active = state
+        key = (id(data), schema)
+        memo = results.get(key)
+        if memo is not None:
+            return memo[1]
+        if key in active:
+            raise CircularReferenceError(
+                "circular reference of %s object" % type(data).__name__)
+
+        active.add(key)
+        try:
+            result = self.__class__._convertor(self, data, schema)
+        finally:
+            active.discard(key)
+        # data is kept alive, so its id is not reused during the call
+        results[key] = (data, result)
+        return result
+
     def __repr__(self):
         return "%s(%s)" % (self.__class__.__name__, repr(self.schema))
 
@@ -286,10 +1401,9 @@ class SchemaConvertor(object):
         result = {}
         if schema.pattern_properties_schemas is not SchemaConst.S_DISABLED:
             for key in data:
-                real_data = data[key]
                 real_schema = schema.pattern_properties(key, istry=True)
                 if real_schema:
-                    result[key] = self._convertor(real_data, real_schema)
+                    result[key] = self._convertor(data[key], real_schema)
 
         if schema.properties_schemas is not SchemaConst.S_DISABLED:
             for key in schema.properties_schemas:
@@ -303,7 +1417,23 @@ class SchemaConvertor(object):
     def _object_convertor(self, data, schema):
         """Object convertor
         """
-        return self._dict_convertor(ObjAsDictAdapter(data), schema)
+        result = {}
+        cls = type(data)
+        if schema.pattern_properties_schemas is not SchemaConst.S_DISABLED:
+            shape = ObjectShape.of(cls)
+            for key in shape.names(data):
+                real_schema = schema.pattern_properties(key, istry=True)
+                if real_schema:
+                    result[key] = self._convertor(
+                        shape.getattr(data, key), real_schema)
+
+        if schema.properties_schemas is not SchemaConst.S_DISABLED:
+            for (key, real_schema), real_data in zip(
+                    schema.properties_schemas.items(),
+                    schema.object_getter(cls)(data)):
+                result[key] = self._convertor(real_data, real_schema)
+
+        return result
 
     def _array_convertor(self, data, schema):
         """iterable object convertor
@@ -311,16 +1441,251 @@ class SchemaConvertor(object):
         result = []
         real_schema = schema.items
         if real_schema is not SchemaConst.S_DISABLED:
+            if real_schema.batch_hooks is not SchemaConst.S_DISABLED and \
+                    self.batch_hooks:
+                return self._batch_hooks_convertor(data, real_schema)
             for item in data:
                 result.append(self._convertor(item, real_schema))
         return result
 
+    def _batch_hooks_convertor(self, data, schema):
+        """Convert the items of an array, the batch variants of the hooks
+        run once over all items
+        """
+        convertor = self.CONVERTORS.get(schema.type)
+        if convertor is None:
+            raise TypeError("Unknown type: %s" % schema.type)
+
+        pre_hook, post_hook = schema.batch_hooks
+        if pre_hook is not None:
+            data = pre_hook(list(data), schema)
+        result = [convertor(self, item, schema) for item in data]
+        if post_hook is not None:
+            result = post_hook(result, schema)
+        return result
+
+    def _lazy_array_convertor(self, data, schema):
+        """iterable object convertor, items are converted on demand
+        """
+        real_schema = schema.items
+        if real_schema is SchemaConst.S_DISABLED:
+            return iter(())
+        return (self._convertor(item, real_schema) for item in data)
+
+    def _batchable(self, schema):
+        """Whether array items of schema can be converted column by column
+        """
+        return schema is not SchemaConst.S_DISABLED and \
+            schema.type in (SchemaConst.T_DICT, SchemaConst.T_OBJ) and \
+            bool(schema.properties_schemas) and \
+            schema.pattern_properties_schemas is SchemaConst.S_DISABLED and \
+            not schema.pre_convert_hooks and not schema.post_convert_hooks
+
+    def _rows_values(self, rows, schema):
+        """Read the properties of every row as a tuple
+        """
+        if schema.type == SchemaConst.T_DICT:
+            keys = tuple(schema.properties_schemas)
+            if len(keys) == 1:
+                key = keys[0]
+                return [(row[key],) for row in rows]
+            return list(map(operator.itemgetter(*keys), rows))
+
+        values = []
+        last_cls = getter = None
+        for row in rows:
+            cls = type(row)
+            if cls is not last_cls:
+                getter = schema.object_getter(cls)
+                last_cls = cls
+            values.append(getter(row))
+        return values
+
+    def _column_convertor(self, values, schema):
+        """Convert one column with a tight loop
+        """
+        if not schema.pre_convert_hooks and not schema.post_convert_hooks:
+            type_ = schema.type
+            if type_ in self.COLUMN_TYPES:
+                return list(map(self.COLUMN_TYPES[type_], values))
+            if type_ == SchemaConst.T_RAW or \
+                    type_ == SchemaConst.T_STR and schema.encoding is None:
+                return list(values)
+            if type_ in (SchemaConst.T_STR, SchemaConst.T_NULL):
+                convertor = self.CONVERTORS[type_]
+                return [convertor(self, value, schema) for value in values]
+        elif schema.batch_hooks is not SchemaConst.S_DISABLED and \
+                self.batch_hooks:
+            return self._batch_hooks_convertor(values, schema)
+
+        convertor = self._convertor
+        return [convertor(value, schema) for value in values]
+
+    def _batch_columns(self, rows, schema):
+        """Convert rows column by column, return the columns in properties
+        order
+        """
+        values = self._rows_values(rows, schema)
+        if not values:
+            return [[] for _ in schema.properties_schemas]
+        return [
+            self._column_convertor(column, real_schema)
+            for column, real_schema in zip(
+                zip(*values), schema.properties_schemas.values())
+        ]
+
+    def _batch_array_convertor(self, data, schema):
+        """iterable object convertor, items of dict or object with
+        properties only are converted column by column
+        """
+        real_schema = schema.items
+        if not self._batchable(real_schema):
+            return self._array_convertor(data, schema)
+
+        keys = list(real_schema.properties_schemas)
+        return [
+            dict(zip(keys, row))
+            for row in zip(*self._batch_columns(data, real_schema))
+        ]
+
+    def _typed_array_convertor(self, data, schema):
+        """iterable object convertor, numeric items without hooks are
+        packed into a typed array
+        """
+        real_schema = schema.items
+        if real_schema is not SchemaConst.S_DISABLED and \
+                real_schema.type in self.TYPED_TYPES and \
+                not real_schema.pre_convert_hooks and \
+                not real_schema.post_convert_hooks:
+            if not hasattr(data, "__len__"):
+                data = list(data)
+            result = self.typed_array(data, real_schema.type)
+            if result is not None:
+                return result
+        return self.untyped_array_convertor(self, data, schema)
+
+    def _run_hooks(self, hooks, data, schema):
+        """Run a hook chain
+        """
+        for hook in hooks:
+            data = hook(data, schema)
+        return data
+
+    def _convert_siblings(self, siblings):
+        """Convert (data, schema) siblings, the hooks of schemas declaring
+        concurrent hooks run in the thread pool and are gathered before
+        conversion continues
+        """
+        submit = self._hook_submit()
+        pre_futures = [
+            submit(self._run_hooks, schema.pre_convert_hooks, data, schema)
+            if schema.concurrent_hooks and schema.pre_convert_hooks else None
+            for data, schema in siblings]
+
+        results = []
+        for (data, schema), future in zip(siblings, pre_futures):
+            if not schema.concurrent_hooks:
+                results.append(self._convertor(data, schema))
+                continue
+            if future is not None:
+                data = future.result()
+            convertor = self.CONVERTORS.get(schema.type)
+            if convertor is None:
+                raise TypeError("Unknown type: %s" % schema.type)
+            results.append(convertor(self, data, schema))
+
+        post_futures = [
+            submit(self._run_hooks, schema.post_convert_hooks, result, schema)
+            if schema.concurrent_hooks and schema.post_convert_hooks else None
+            for result, (_, schema) in zip(results, siblings)]
+        return [
+            result if future is None else future.result()
+            for result, future in zip(results, post_futures)]
+
+    def _has_concurrent_children(self, schema):
+        concurrent = self.concurrent_nodes.get(schema)
+        if concurrent is None:
+            concurrent = self.concurrent_nodes[schema] = any(
+                sch.concurrent_hooks for sch in schema.subschemas())
+        return concurrent
+
+    def _concurrent_array_convertor(self, data, schema):
+        """iterable object convertor, sibling hooks run concurrently
+        """
+        real_schema = schema.items
+        if real_schema is SchemaConst.S_DISABLED or \
+                not real_schema.concurrent_hooks:
+            return self._array_convertor(data, schema)
+
+        result = []
+        window = self.hook_workers * self.HOOK_WINDOW
+        iterator = iter(data)
+        while True:
+            siblings = [
+                (item, real_schema)
+                for item in itertools.islice(iterator, window)]
+            if not siblings:
+                return result
+            result.extend(self._convert_siblings(siblings))
+
+    def _concurrent_members_convertor(self, schema, names, get, values):
+        """Convert the names matching patternProperties, whose data is read
+        by get only once matched, and the values of properties, sibling
+        hooks run concurrently
+        """
+        keys, siblings = [], []
+        if schema.pattern_properties_schemas is not SchemaConst.S_DISABLED:
+            for key in names:
+                real_schema = schema.pattern_properties(key, istry=True)
+                if real_schema:
+                    keys.append(key)
+                    siblings.append((get(key), real_schema))
+
+        if schema.properties_schemas is not SchemaConst.S_DISABLED:
+            for (key, real_schema), real_data in zip(
+                    schema.properties_schemas.items(), values):
+                keys.append(key)
+                siblings.append((real_data, real_schema))
+
+        result = {}
+        for key, value in zip(keys, self._convert_siblings(siblings)):
+            result[key] = value
+        return result
+
+    def _concurrent_dict_convertor(self, data, schema):
+        """Dict convertor, sibling hooks run concurrently
+        """
+        if not self._has_concurrent_children(schema):
+            return self._dict_convertor(data, schema)
+        return self._concurrent_members_convertor(
+            schema, data, data.__getitem__,
+            (data[key] for key in schema.properties_schemas))
+
+    def _concurrent_object_convertor(self, data, schema):
+        """Object convertor, sibling hooks run concurrently
+        """
+        if not self._has_concurrent_children(schema):
+            return self._object_convertor(data, schema)
+
+        cls = type(data)
+        shape = ObjectShape.of(cls)
+        values = ()
+        if schema.properties_schemas is not SchemaConst.S_DISABLED:
+            values = schema.object_getter(cls)(data)
+        return self._concurrent_members_convertor(
+            schema, shape.names(data), functools.partial(shape.getattr, data),
+            values)
+
     def _number_convertor(self, data, schema):
         """Auto number convertor
         """
+        if type(data) is Types.IntType:
+            return data
         num = float(data)
         if num.is_integer():
-            num = int(num)
+            if -FLOAT_EXACT_MAX < num < FLOAT_EXACT_MAX:
+                return int(num)
+            return exact_int(data, num)
         return num
 
     def _null_convertor(self, data, schema):
@@ -344,15 +1709,28 @@ class SchemaConvertor(object):
     def _str_convertor(self, data, schema):
         """auto unicode string convertor
         """
-        if schema.encoding is None:
-            return data
-
-        if isinstance(data, unicode):
-            return data
-        elif isinstance(data, bytes):
-            return data.decode(schema.encoding, schema.decoderrors)
-        else:
-            return str(data)
+        return schema.str_convertor(data)
+
+    FINISH = -1
+    LEAF_TYPES = frozenset([
+        SchemaConst.T_STR, SchemaConst.T_INT, SchemaConst.T_FLOAT,
+        SchemaConst.T_BOOL, SchemaConst.T_NUM, SchemaConst.T_NULL,
+        SchemaConst.T_RAW,
+    ])
+
+    MEMO_SKIP_TYPES = frozenset([
+        unicode, str, bytes, Types.IntType, Types.FloatType,
+        Types.BooleanType, Types.NoneType,
+    ])
+
+    TYPED_TYPES = (SchemaConst.T_INT, SchemaConst.T_FLOAT, SchemaConst.T_NUM)
+
+    COLUMN_TYPES = {
+        SchemaConst.T_INT: Types.IntType,
+        SchemaConst.T_FLOAT: Types.FloatType,
+        SchemaConst.T_BOOL: Types.BooleanType,
+        SchemaConst.T_NUM: to_number,
+    }
 
     CONVERTORS = {
         SchemaConst.T_STR: _str_convertor,
@@ -369,8 +1747,203 @@ class SchemaConvertor(object):
     }
 
 
+def _value_fingerprint(value):
+    """Hashable fingerprint of a schema value
+    """
+    kind = type(value)
+    if kind is str or kind is unicode:
+        return (kind, value)
+    if isinstance(value, (list, tuple)):
+        return (tuple, tuple(_value_fingerprint(v) for v in value))
+    try:
+        hash(value)
+    except TypeError:
+        # unhashable callables are alive as long as the cached schema is
+        return (id, id(value))
+    return (type(value), value)
+
+
+def _hook_fingerprint(hooks):
+    """Hashable fingerprint of a hook field, builtin hook names resolved
+    """
+    builtins = {
+        SchemaConst.F_HOOK_PRECONVERT: SchemaBuiltinHook.Pre_Convert_Hook,
+        SchemaConst.F_HOOK_POSTCONVERT: SchemaBuiltinHook.Post_Convert_Hook,
+    }
+    fields = []
+    for field, value in hooks.items():
+        if field in builtins:
+            if not value:
+                continue
+            value = tuple(
+                _value_fingerprint(SchemaBuiltinHook.resolve(
+                    builtins[field], hook))
+                for hook in value)
+        else:
+            value = _value_fingerprint(value)
+        fields.append((_value_fingerprint(field), value))
+    return tuple(_sorted_fields(fields))
+
+
+def _sorted_fields(fields):
+    """Sort (field fingerprint, value) pairs, fields of different types
+    are ordered by repr
+    """
+    try:
+        return sorted(fields, key=operator.itemgetter(0))
+    except TypeError:
+        return sorted(fields, key=lambda f: repr(f[0]))
+
+
+def schema_fingerprint(schema, memo=None, intern=None):
+    """Build a canonical hashable fingerprint of schema content
+
+    Schema fields are sorted, while the items of properties, typeOf and
+    patternProperties keep their order because it decides the output
+    order and the matching precedence. Fingerprints of dicts are kept in
+    memo by id, the dicts must outlive it. intern maps the fingerprint of
+    a dict to a small substitute, so fingerprints of parents stay flat.
+    """
+    if isinstance(schema, Schema):
+        return (Schema, id(schema))
+    if isinstance(schema, (str, unicode)):
+        # the dict is temporary, it can not be kept in memo
+        return schema_fingerprint(
+            {SchemaConst.F_TYPE: schema}, intern=intern)
+    if not isinstance(schema, dict):
+        return _value_fingerprint(schema)
+    if memo is not None:
+        fingerprint = memo.get(id(schema))
+        if fingerprint is not None:
+            return fingerprint
+
+    fields = []
+    for field, value in schema.items():
+        if field in SchemaConvertorCache.MAPPING_FIELDS and \
+                isinstance(value, dict):
+            value = tuple(
+                (_value_fingerprint(k), schema_fingerprint(s, memo, intern))
+                for k, s in value.items())
+        elif field == SchemaConst.F_ITEMS:
+            value = schema_fingerprint(value, memo, intern)
+        elif field == SchemaConst.F_HOOK and isinstance(value, dict):
+            value = _hook_fingerprint(value)
+        else:
+            value = _value_fingerprint(value)
+        fields.append((_value_fingerprint(field), value))
+    fingerprint = tuple(_sorted_fields(fields))
+    if intern is not None:
+        fingerprint = intern(fingerprint)
+    if memo is not None:
+        memo[id(schema)] = fingerprint
+    return fingerprint
+
+
+class SchemaConvertorCache(object):
+    """LRU cache of convertors keyed by schema fingerprint
+
+    With identity=True schemas seen before are found by identity first,
+    so a module level schema is fingerprinted once, but schema dicts
+    changed in place after they were used are not noticed. Convertors
+    are compiled before they are cached, threads may share them.
+    """
+    MAXSIZE = 128
+    MAPPING_FIELDS = frozenset([
+        SchemaConst.F_PROPERTIES,
+        SchemaConst.F_TYPEOF,
+        SchemaConst.F_PATTERNPROPERTIES,
+        SchemaConst.F_DEFINITIONS,
+    ])
+
+    def __init__(self, maxsize=MAXSIZE, identity=False):
+        self.maxsize = maxsize
+        self.identity = identity
+        self.convertors = OrderedDict()
+        # (id(schema), options): (schema, convertor), schema keeps the id
+        # taken; hits skip the fingerprint, which is slow to hash as well
+        self.identities = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.convertors)
+
+    def __repr__(self):
+        return "%s(maxsize=%r, identity=%r)" % (
+            self.__class__.__name__, self.maxsize, self.identity)
+
+    def get(self, schema, **options):
+        """Get a cached convertor or build a new one
+        """
+        options = tuple(sorted(options.items())) if options else ()
+        identity = (id(schema), options) if self.identity else None
+        if identity is not None:
+            with self.lock:
+                entry = self.identities.pop(identity, None)
+                if entry is not None and entry[0] is schema:
+                    self.hits += 1
+                    self.identities[identity] = entry
+                    return entry[1]
+
+        key = (schema_fingerprint(schema), options)
+        with self.lock:
+            cvtr = self.convertors.pop(key, None)
+            if cvtr is not None:
+                self.hits += 1
+                self.convertors[key] = cvtr
+                self.remember(identity, schema, cvtr)
+                return cvtr
+            self.misses += 1
+
+        cvtr = SchemaConvertor(schema, **dict(options))
+        # lazy compile would race in the threads sharing the convertor
+        cvtr.schema.compile_all()
+        with self.lock:
+            self.convertors[key] = cvtr
+            while len(self.convertors) > self.maxsize:
+                self.convertors.popitem(last=False)
+                self.evictions += 1
+            self.remember(identity, schema, cvtr)
+        return cvtr
+
+    def remember(self, identity, schema, cvtr):
+        """Find cvtr by the identity of schema next time, the lock must be
+        held
+        """
+        if identity is None:
+            return
+        self.identities.pop(identity, None)
+        self.identities[identity] = (schema, cvtr)
+        while len(self.identities) > self.maxsize:
+            self.identities.popitem(last=False)
+
+    def clear(self):
+        """Drop all convertors and reset counters
+        """
+        with self.lock:
+            self.convertors.clear()
+            self.identities.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        """Get the cache counters
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self.convertors),
+            "maxsize": self.maxsize,
+        }
+
+
+convertor_cache = SchemaConvertorCache()
+
+
 def convert_by_schema(data, schema):
     """a quick tool to convert data by schema
     """
-    cvtr = SchemaConvertor(schema)
+    cvtr = convertor_cache.get(schema)
     return cvtr(data)
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""Generated convertor code cached on disk
+
+    cache = SchemaDiskCache("/var/cache/schemaconvertor")
+    cvtr = cache.get(schema)
+"""
+
+import os
+import sys
+import glob
+import marshal
+import hashlib
+import tempfile
+
+from schemaconvertor import __version__
+from schemaconvertor.convertor import SchemaConvertor
+
+
+def _cache_tag():
+    implementation = getattr(sys, "implementation", None)
+    if implementation is not None and implementation.cache_tag:
+        return implementation.cache_tag
+    return "python-%d%d" % sys.version_info[:2]
+
+
+class SchemaDiskCache(object):
+    """Code objects of compiled schemas kept in a directory
+
+    The generated source is deterministic for a schema, so the code is
+    keyed by the digest of the source, the library version and the
+    python bytecode tag. Warm starts still build the schema tree and
+    generate the source, but skip compiling it, which is the dominant
+    cost of the compiled engine. It only speeds up compiled=True relative
+    to itself, building an interpreted convertor is still cheaper.
+    """
+    SUFFIX = ".code"
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+
+    def __repr__(self):
+        return "%s(%r)" % (self.__class__.__name__, self.directory)
+
+    def key(self, source):
+        digest = hashlib.sha256()
+        for part in (__version__, _cache_tag(), source):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + self.SUFFIX)
+
+    def code(self, source, filename):
+        """Get the code object of source, compile and store it on miss
+        """
+        path = self.path(self.key(source))
+        try:
+            with open(path, "rb") as fp:
+                code = marshal.loads(fp.read())
+        except (IOError, OSError, EOFError, ValueError, TypeError):
+            pass
+        else:
+            self.hits += 1
+            return code
+
+        self.misses += 1
+        code = compile(source, filename, "exec")
+        self.store(path, code)
+        return code
+
+    def store(self, path, code):
+        """Write code to path atomically, failures leave no file behind
+        """
+        tmp = None
+        try:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            fd, tmp = tempfile.mkstemp(
+                suffix=".tmp", prefix=".", dir=self.directory)
+            with os.fdopen(fd, "wb") as fp:
+                marshal.dump(code, fp)
+            getattr(os, "replace", os.rename)(tmp, path)
+        except (IOError, OSError):
+            if tmp is not None and os.path.exists(tmp):
+                os.remove(tmp)
+
+    def clear(self):
+        for path in glob.glob(os.path.join(self.directory, "*" + self.SUFFIX)):
+            os.remove(path)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+    def get(self, schema, lazy=False):
+        """Build a compiled convertor using the cached code
+        """
+        return SchemaConvertor(
+            schema, compiled=True, lazy=lazy, code_cache=self)
@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import json
+import functools
+from json.encoder import encode_basestring, encode_basestring_ascii
+
+from schemaconvertor.convertor import SchemaConst, ObjectShape, unicode
+
+
+def _float_str(num):
+    """Float to JSON text, the same as json.dumps
+    """
+    if num != num:
+        return "NaN"
+    if num == float("inf"):
+        return "Infinity"
+    if num == -float("inf"):
+        return "-Infinity"
+    return float.__repr__(num)
+
+
+class SchemaEncoder(object):
+    """Encode data to JSON text by schema without building the result
+
+    The schema fixes the type of every node, so scalars are encoded
+    directly instead of going through the generic type checks of
+    `json`. Text parts are buffered and yielded as chunks between array
+    items, so memory stays flat however long the arrays are.
+
+    Nodes with post-convert hooks need the converted value, these
+    subtrees are converted by the convertor and encoded by `json`.
+    """
+    BUFFER_PARTS = 4096
+
+    def __init__(self, convertor, ensure_ascii=True, separators=None):
+        self.convertor = convertor
+        self.encode_string = encode_basestring_ascii \
+            if ensure_ascii else encode_basestring
+        self.item_separator, self.key_separator = separators or (", ", ": ")
+        self.generic = json.JSONEncoder(
+            ensure_ascii=ensure_ascii, separators=separators)
+
+    def iterencode(self, data, schema=None):
+        """Encode data to JSON text chunks, by schema or the schema of the
+        convertor
+        """
+        buf = []
+        if schema is None:
+            schema = self.convertor.schema
+        for _ in self._iterencode(data, schema, buf):
+            yield "".join(buf)
+            del buf[:]
+        if buf:
+            yield "".join(buf)
+
+    def _iterencode(self, data, schema, buf):
+        """Append text parts to buf, yield when buf should be flushed
+        """
+        if schema.post_convert_hooks:
+            buf.append(self.generic.encode(
+                self.convertor._convertor(data, schema)))
+            return
+
+        encoder = self.ENCODERS.get(schema.type)
+        if encoder is None:
+            raise TypeError("Unknown type: %s" % schema.type)
+
+        for hook in schema.pre_convert_hooks:
+            data = hook(data, schema)
+
+        if schema.type in self.CONTAINERS:
+            for flush in encoder(self, data, schema, buf):
+                yield flush
+        else:
+            buf.append(encoder(self, data, schema))
+
+    def _encode_key(self, key):
+        """Encode dict key, the same as json.dumps
+        """
+        if isinstance(key, (str, unicode)):
+            return self.encode_string(key)
+        if key is True:
+            return '"true"'
+        if key is False:
+            return '"false"'
+        if key is None:
+            return '"null"'
+        if isinstance(key, int):
+            return '"%s"' % int.__repr__(key)
+        if isinstance(key, float):
+            return '"%s"' % _float_str(key)
+        raise TypeError(
+            "keys must be str, int, float, bool or None, not %s" %
+            key.__class__.__name__)
+
+    def _members_encoder(self, schema, buf, keys, get, values):
+        """Encode the keys matching patternProperties, whose data is read by
+        get only once matched, and the values of properties
+        """
+        buf.append("{")
+        first = True
+        properties = schema.properties_schemas
+        if schema.pattern_properties_schemas is not SchemaConst.S_DISABLED:
+            for key in keys:
+                real_schema = schema.pattern_properties(key, istry=True)
+                # properties take precedence over patternProperties
+                if real_schema and key not in properties:
+                    real_data = get(key)
+                    if not first:
+                        buf.append(self.item_separator)
+                    first = False
+                    buf.append(self._encode_key(key))
+                    buf.append(self.key_separator)
+                    for flush in self._iterencode(
+                            real_data, real_schema, buf):
+                        yield flush
+
+        if properties is not SchemaConst.S_DISABLED:
+            for (key, real_schema), real_data in zip(
+                    properties.items(), values):
+                if not first:
+                    buf.append(self.item_separator)
+                first = False
+                buf.append(self._encode_key(key))
+                buf.append(self.key_separator)
+                for flush in self._iterencode(real_data, real_schema, buf):
+                    yield flush
+        buf.append("}")
+
+    def _dict_encoder(self, data, schema, buf):
+        """Dict encoder
+        """
+        return self._members_encoder(
+            schema, buf, data, data.__getitem__,
+            (data[key] for key in schema.properties_schemas))
+
+    def _object_encoder(self, data, schema, buf):
+        """Object encoder
+        """
+        cls = type(data)
+        shape = ObjectShape.of(cls)
+        values = ()
+        if schema.properties_schemas is not SchemaConst.S_DISABLED:
+            values = schema.object_getter(cls)(data)
+        return self._members_encoder(
+            schema, buf, shape.names(data),
+            functools.partial(shape.getattr, data), values)
+
+    def _array_encoder(self, data, schema, buf):
+        """Iterable object encoder
+        """
+        buf.append("[")
+        real_schema = schema.items
+        if real_schema is not SchemaConst.S_DISABLED:
+            first = True
+            for item in data:
+                if not first:
+                    buf.append(self.item_separator)
+                first = False
+                for flush in self._iterencode(item, real_schema, buf):
+                    yield flush
+                if len(buf) >= self.BUFFER_PARTS:
+                    yield True
+        buf.append("]")
+
+    def _auto_type_encoder(self, data, schema, buf):
+        """when schema.type is None
+        """
+        real_schema = schema.typeof(data, istry=True)
+        if real_schema is SchemaConst.S_UNDEFINED:
+            buf.append("null")
+            return
+        for flush in self._iterencode(data, real_schema, buf):
+            yield flush
+
+    def _str_encoder(self, data, schema):
+        string = self.convertor._str_convertor(data, schema)
+        if isinstance(string, (str, unicode)):
+            return self.encode_string(string)
+        return self.generic.encode(string)
+
+    def _int_encoder(self, data, schema):
+        return int.__repr__(int(data))
+
+    def _float_encoder(self, data, schema):
+        return _float_str(float(data))
+
+    def _number_encoder(self, data, schema):
+        num = self.convertor._number_convertor(data, schema)
+        if isinstance(num, float):
+            return _float_str(num)
+        return int.__repr__(num)
+
+    def _bool_encoder(self, data, schema):
+        return "true" if data else "false"
+
+    def _null_encoder(self, data, schema):
+        return "null"
+
+    def _raw_encoder(self, data, schema):
+        return self.generic.encode(data)
+
+    CONTAINERS = frozenset([
+        SchemaConst.T_DICT,
+        SchemaConst.T_OBJ,
+        SchemaConst.T_LIST,
+        None,
+    ])
+
+    ENCODERS = {
+        SchemaConst.T_STR: _str_encoder,
+        SchemaConst.T_INT: _int_encoder,
+        SchemaConst.T_FLOAT: _float_encoder,
+        SchemaConst.T_BOOL: _bool_encoder,
+        SchemaConst.T_NUM: _number_encoder,
+        SchemaConst.T_DICT: _dict_encoder,
+        SchemaConst.T_OBJ: _object_encoder,
+        SchemaConst.T_LIST: _array_encoder,
+        SchemaConst.T_NULL: _null_encoder,
+        SchemaConst.T_RAW: _raw_encoder,
+        None: _auto_type_encoder,
+    }
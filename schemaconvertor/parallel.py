@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import sys
+import pickle
+import itertools
+import multiprocessing
+
+from schemaconvertor.convertor import SchemaConvertor
+
+SchemaPickleError = type("SchemaPickleError", (TypeError,), {})
+
+_worker_convertor = None
+
+
+def _init_worker(schema, options):
+    """Build the convertor of a worker process once
+    """
+    global _worker_convertor
+    _worker_convertor = SchemaConvertor(schema, **options)
+
+
+def _convert_chunk(chunk):
+    cvtr = _worker_convertor
+    return [cvtr(item) for item in chunk]
+
+
+def chunked(iterable, chunksize):
+    """Split iterable into lists of chunksize items
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, chunksize))
+        if not chunk:
+            return
+        yield chunk
+
+
+class DefaultContext(object):
+    """The only context of multiprocessing before python 3.4, it forks
+    except on windows
+    """
+    Pool = staticmethod(multiprocessing.Pool)
+
+    @staticmethod
+    def get_start_method():
+        return "spawn" if sys.platform == "win32" else "fork"
+
+
+def get_context(context=None):
+    if context is None or isinstance(context, str):
+        if hasattr(multiprocessing, "get_context"):
+            return multiprocessing.get_context(context)
+        if context not in (None, DefaultContext.get_start_method()):
+            raise ValueError(
+                "start method %s needs python 3.4 or later" % context)
+        return DefaultContext
+    return context
+
+
+def check_picklable(schema, context):
+    """Raise SchemaPickleError if schema can not be sent to workers
+
+    Forked workers inherit the schema, other start methods pickle it.
+    """
+    if context.get_start_method() == "fork":
+        return
+    try:
+        pickle.dumps(schema, pickle.HIGHEST_PROTOCOL)
+    except Exception as err:
+        raise SchemaPickleError(
+            "schema can not be sent to worker processes, hooks must be "
+            "importable functions: %s" % err)
+
+
+def _map_pool(convertor, iterable, workers, chunksize, context):
+    schema = convertor.schema.origin_schema
+    pool = context.Pool(workers, _init_worker, (schema, convertor.options))
+    try:
+        for results in pool.imap(
+                _convert_chunk, chunked(iterable, chunksize)):
+            for result in results:
+                yield result
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def map_parallel(convertor, iterable, workers=None, chunksize=1000,
+                 fallback=False, context=None):
+    """Convert items of iterable in worker processes, return an iterator
+    of the results in order
+
+    The schema and the options of convertor are shipped to every worker
+    once, items are sent in chunks of chunksize. Lazy convertors are
+    refused, their results can not be sent back. If the schema can not
+    be pickled, the items are converted in this process when fallback is
+    set, otherwise SchemaPickleError is raised. Errors are raised by the
+    call, the workers start on the first result.
+    """
+    if convertor.lazy:
+        raise ValueError(
+            "lazy results can not be sent back from worker processes")
+    context = get_context(context)
+    try:
+        check_picklable(convertor.schema.origin_schema, context)
+    except SchemaPickleError:
+        if not fallback:
+            raise
+        return (convertor(item) for item in iterable)
+    return _map_pool(convertor, iterable, workers, chunksize, context)
@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""Per schema node profiling
+
+    cvtr = ProfiledSchemaConvertor(schema)
+    cvtr(data)
+    print(cvtr.format_report())
+    cvtr.dump_collapsed(open("out.folded", "w"))  # flamegraph.pl out.folded
+"""
+
+from timeit import default_timer
+
+from schemaconvertor.convertor import Schema, SchemaConst, SchemaConvertor
+
+ROOT_PATH = "#"
+
+
+def escape(token):
+    """Escape a JSON pointer token
+    """
+    return token.replace("~", "~0").replace("/", "~1")
+
+
+def _typeof_token(key):
+    if isinstance(key, tuple):
+        return ",".join(t.__name__ for t in key)
+    return key.__name__
+
+
+def children(schema):
+    """Get the direct sub schemas with their path tokens
+    """
+    result = []
+    if schema.items is not SchemaConst.S_DISABLED:
+        result.append((SchemaConst.F_ITEMS, schema.items))
+    if schema.properties_schemas is not SchemaConst.S_DISABLED:
+        for key, sch in schema.properties_schemas.items():
+            result.append(("%s/%s" % (
+                SchemaConst.F_PROPERTIES, escape(str(key))), sch))
+    if schema.pattern_properties_schemas is not SchemaConst.S_DISABLED:
+        for pattern, sch in schema.pattern_properties_schemas.items():
+            result.append(("%s/%s" % (
+                SchemaConst.F_PATTERNPROPERTIES, escape(pattern.pattern)),
+                sch))
+    if schema.typeof_schemas is not SchemaConst.S_DISABLED:
+        for key, sch in schema.typeof_schemas.items():
+            result.append(("%s/%s" % (
+                SchemaConst.F_TYPEOF, escape(_typeof_token(key))), sch))
+    if schema.typeof_default_schema is not SchemaConst.S_DISABLED:
+        result.append(("%s/%s" % (
+            SchemaConst.F_TYPEOF, SchemaConst.F_DEFAULT),
+            schema.typeof_default_schema))
+    return result
+
+
+def schema_paths(schema):
+    """Map every node of the schema tree to its JSON pointer style path,
+    the first path found wins for shared nodes
+    """
+    paths = {schema: ROOT_PATH}
+    schemas = [schema]
+    while schemas:
+        sch = schemas.pop()
+        path = paths[sch]
+        for token, subschema in children(sch):
+            if subschema not in paths:
+                paths[subschema] = "%s/%s" % (path, token)
+                schemas.append(subschema)
+    return paths
+
+
+class NodeStats(object):
+    """Timing of one schema node, in seconds
+    """
+
+    __slots__ = ("path", "calls", "total_time", "self_time", "hook_time")
+
+    def __init__(self, path):
+        self.path = path
+        self.calls = 0
+        self.total_time = 0.0
+        self.self_time = 0.0
+        self.hook_time = 0.0
+
+    def __repr__(self):
+        return "NodeStats(%r, calls=%d, total=%.6f, self=%.6f, hooks=%.6f)" % (
+            self.path, self.calls, self.total_time, self.self_time,
+            self.hook_time)
+
+
+class ProfiledSchemaConvertor(SchemaConvertor):
+    """Interpreting convertor recording the time spent in every schema
+    node
+
+    Profiling lives in this subclass only, SchemaConvertor itself keeps
+    its dispatch path untouched. Identical sub schemas get nodes of their
+    own so that each is reported under its own path, only the targets of
+    `$ref` stay shared and are reported under the first path found.
+    """
+
+    def __init__(self, schema):
+        if not isinstance(schema, Schema):
+            schema = Schema(schema, shared=False)
+        super(ProfiledSchemaConvertor, self).__init__(schema)
+        # every item is timed with its own hooks
+        self.batch_hooks = False
+        self.schema.compile_all()
+        self.paths = schema_paths(self.schema)
+        self.stats = {}
+        self.stacks = {}
+        self.frames = []
+
+    def reset(self):
+        self.stats.clear()
+        self.stacks.clear()
+
+    def _convertor(self, data, schema):
+        """Main convertor, timed
+        """
+        frames = self.frames
+        path = self.paths.get(schema)
+        if path is None:
+            path = self.paths[schema] = "%s/?" % (
+                frames[-1][0] if frames else ROOT_PATH)
+        frame = [path, 0.0, 0.0]  # path, children time, hook time
+        frames.append(frame)
+        start = default_timer()
+        try:
+            convertor = self.CONVERTORS.get(schema.type)
+            if convertor is None:
+                raise TypeError("Unknown type: %s" % schema.type)
+
+            if schema.pre_convert_hooks:
+                hook_start = default_timer()
+                for hook in schema.pre_convert_hooks:
+                    data = hook(data, schema)
+                frame[2] += default_timer() - hook_start
+
+            result = convertor(self, data, schema)
+
+            if schema.post_convert_hooks:
+                hook_start = default_timer()
+                for hook in schema.post_convert_hooks:
+                    result = hook(result, schema)
+                frame[2] += default_timer() - hook_start
+        finally:
+            elapsed = default_timer() - start
+            stack = tuple(f[0] for f in frames)
+            frames.pop()
+            if frames:
+                frames[-1][1] += elapsed
+
+            stats = self.stats.get(path)
+            if stats is None:
+                stats = self.stats[path] = NodeStats(path)
+            stats.calls += 1
+            stats.total_time += elapsed
+            stats.self_time += elapsed - frame[1]
+            stats.hook_time += frame[2]
+            self.stacks[stack] = \
+                self.stacks.get(stack, 0.0) + elapsed - frame[1]
+
+        return result
+
+    def report(self):
+        """Get NodeStats of the visited nodes, slowest self time first
+        """
+        return sorted(
+            self.stats.values(), key=lambda s: s.self_time, reverse=True)
+
+    def format_report(self, limit=None):
+        lines = ["%10s %12s %12s %12s  %s" % (
+            "calls", "total(ms)", "self(ms)", "hooks(ms)", "path")]
+        for stats in self.report()[:limit]:
+            lines.append("%10d %12.3f %12.3f %12.3f  %s" % (
+                stats.calls, stats.total_time * 1e3, stats.self_time * 1e3,
+                stats.hook_time * 1e3, stats.path))
+        return "\n".join(lines)
+
+    def collapsed_stacks(self):
+        """Get the self time of every call stack in the collapsed stack
+        format of flamegraph.pl, in microseconds
+        """
+        return [
+            "%s %d" % (
+                ";".join(p.replace(";", "%3B") for p in stack),
+                round(seconds * 1e6))
+            for stack, seconds in sorted(self.stacks.items())
+        ]
+
+    def dump_collapsed(self, fp):
+        for line in self.collapsed_stacks():
+            fp.write(line + "\n")
@@ -0,0 +1,7 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import sys
+
+# async def is a syntax error before python 3.5
+collect_ignore = [] if sys.version_info >= (3, 5) else ["test_aio.py"]
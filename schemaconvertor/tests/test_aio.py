@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import asyncio
+from unittest import TestCase
+
+from schemaconvertor.aio import AsyncSchemaConvertor
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+class Pair(object):
+
+    def __init__(self, key, value):
+        self.key = key
+        self.value = value
+
+
+class AsyncItems(object):
+
+    def __init__(self, items):
+        self.items = items
+        self.read = 0
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.read >= len(self.items):
+            raise StopAsyncIteration
+        await asyncio.sleep(0)
+        self.read += 1
+        return self.items[self.read - 1]
+
+
+class TestAsyncSchemaConvertor(TestCase):
+
+    def test_sync_schema(self):
+        cvtr = AsyncSchemaConvertor({
+            "type": "dict",
+            "properties": {"a": "integer", "b": "string"},
+        })
+        self.assertEqual(run(cvtr({"a": "1", "b": 2})), {"a": 1, "b": "2"})
+        self.assertFalse(cvtr._needs_async(cvtr.schema))
+
+    def test_awaitable_hooks(self):
+        async def load(data, schema):
+            await asyncio.sleep(0)
+            return data * 2
+
+        cvtr = AsyncSchemaConvertor({
+            "type": "object",
+            "properties": {
+                "key": {"type": "string", "hook": {"pre-convert": [load]}},
+                "value": {
+                    "type": "integer",
+                    "hook": {
+                        "pre-convert": [load],
+                        "post-convert": [lambda data, schema: data + 1],
+                    },
+                },
+            },
+        })
+        self.assertEqual(run(cvtr(Pair("a", 2))), {"key": "aa", "value": 5})
+
+    def test_concurrent_siblings(self):
+        state = {"running": 0, "peak": 0}
+
+        async def load(data, schema):
+            state["running"] += 1
+            state["peak"] = max(state["peak"], state["running"])
+            await asyncio.sleep(0.01)
+            state["running"] -= 1
+            return data
+
+        schema = {
+            "type": "array",
+            "items": {"type": "integer", "hook": {"pre-convert": [load]}},
+        }
+        self.assertEqual(
+            run(AsyncSchemaConvertor(schema)(range(8))), list(range(8)))
+        self.assertEqual(state["peak"], 8)
+
+        state["peak"] = 0
+        cvtr = AsyncSchemaConvertor(schema, concurrency=3)
+        self.assertEqual(run(cvtr(range(8))), list(range(8)))
+        self.assertEqual(state["peak"], 3)
+
+    def test_async_iterable(self):
+        cvtr = AsyncSchemaConvertor({
+            "type": "array",
+            "items": {"type": "array", "items": "string"},
+        })
+        rows = AsyncItems([AsyncItems([1, 2]), [3]])
+        self.assertEqual(run(cvtr(rows)), [["1", "2"], ["3"]])
+
+        async def load(data, schema):
+            await asyncio.sleep(0)
+            return data + "!"
+
+        cvtr = AsyncSchemaConvertor({
+            "type": "array",
+            "items": {"type": "string", "hook": {"post-convert": [load]}},
+        })
+        self.assertEqual(run(cvtr(AsyncItems([1, 2]))), ["1!", "2!"])
+
+    def test_typeof(self):
+        async def load(data, schema):
+            return data.value
+
+        cvtr = AsyncSchemaConvertor({
+            "type": "array",
+            "items": {
+                "typeOf": {
+                    Pair: {"type": "integer", "hook": {"pre-convert": [load]}},
+                    "default": "string",
+                },
+            },
+        })
+        self.assertEqual(run(cvtr([Pair(1, "2"), 3])), [2, "3"])
+
+    def test_task_window(self):
+        state = {"running": 0, "peak": 0}
+
+        async def load(data, schema):
+            state["running"] += 1
+            state["peak"] = max(state["peak"], state["running"])
+            await asyncio.sleep(0)
+            state["running"] -= 1
+            return data
+
+        cvtr = AsyncSchemaConvertor({
+            "type": "array",
+            "items": {"type": "integer", "hook": {"pre-convert": [load]}},
+        })
+        cvtr.TASK_WINDOW = 4
+        self.assertEqual(run(cvtr(range(100))), list(range(100)))
+        self.assertEqual(state["peak"], 4)
+
+        state["peak"] = 0
+        self.assertEqual(
+            run(cvtr(AsyncItems(list(range(10))))), list(range(10)))
+        self.assertLessEqual(state["peak"], 4)
+
+    def test_sync_entry_points(self):
+        seen = []
+
+        async def load(data, schema):
+            seen.append(data)
+            return data
+
+        cvtr = AsyncSchemaConvertor({
+            "type": "array",
+            "items": {"type": "string", "hook": {"pre-convert": [load]}},
+        })
+        self.assertEqual(run(cvtr.warmup([1, 2])).nodes, 2)
+        self.assertEqual(seen, [1, 2])
+        for method in (cvtr.map_parallel, cvtr.iter, cvtr.columns,
+                       cvtr.iter_encode):
+            with self.assertRaises(TypeError):
+                method([1])
+        with self.assertRaises(TypeError):
+            cvtr.dump([1], None)
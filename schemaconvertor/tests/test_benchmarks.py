@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import os
+import json
+import tempfile
+from unittest import TestCase
+
+from schemaconvertor.convertor import SchemaConvertor
+from schemaconvertor.benchmarks import runner
+from schemaconvertor.benchmarks.__main__ import main
+from schemaconvertor.benchmarks.workloads import WORKLOADS, get_workloads
+
+
+class TestWorkloads(TestCase):
+
+    def test_engines_agree(self):
+        for workload in WORKLOADS:
+            data = workload.build(10)
+            results = [
+                SchemaConvertor(workload.schema, **options)(data)
+                for options in runner.ENGINES.values()]
+            for result in results[1:]:
+                self.assertEqual(results[0], result, workload.name)
+
+    def test_count_nodes(self):
+        workload, = get_workloads(["array"])
+        # root, 2 items and 3 integers per item
+        self.assertEqual(runner.count_nodes(workload.schema, [[1, 2, 3]] * 2), 9)
+
+
+class TestRunner(TestCase):
+
+    def test_run_and_compare(self):
+        document = runner.run(
+            get_workloads(["string", "object"]), [10], min_time=0,
+            repeat=1)
+        self.assertEqual(len(document["results"]), 2 * len(runner.ENGINES))
+        result = document["results"][0]
+        self.assertGreater(result["ops_per_sec"], 0)
+        self.assertGreater(result["ns_per_node"], 0)
+        self.assertEqual(runner.compare(document, document), [])
+
+        slower = json.loads(json.dumps(document))
+        slower["results"][0]["ops_per_sec"] /= 2
+        regressions = runner.compare(document, slower)
+        self.assertEqual(len(regressions), 1)
+        self.assertEqual(regressions[0][1], "ops_per_sec")
+
+    def test_main(self):
+        fd, path = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        try:
+            self.assertEqual(main([
+                "run", "-w", "null", "-s", "10", "--min-time", "0",
+                "--repeat", "1", "-o", path]), 0)
+            self.assertEqual(main(["compare", path, path]), 0)
+        finally:
+            os.remove(path)
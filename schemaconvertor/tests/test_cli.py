@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import io
+import os
+import json
+import shutil
+import tempfile
+from unittest import TestCase
+
+from schemaconvertor import cli
+from schemaconvertor.benchmarks import runner
+
+SCHEMA = {"type": "dict", "properties": {"a": "integer", "b": "string"}}
+
+
+class TestCli(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.input = self.path("input.jsonl")
+        with open(self.input, "w") as fp:
+            for i in range(50):
+                fp.write(json.dumps({"a": str(i), "b": i, "c": None}) + "\n")
+                if i % 7 == 0:
+                    fp.write("\n")
+        self.expected = "".join(
+            json.dumps({"a": i, "b": str(i)}) + "\n" for i in range(50))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def read(self, path):
+        with open(path) as fp:
+            return fp.read()
+
+    def test_iter_blocks(self):
+        data = b'1\n\n22\n333\n4444'
+        for size in (1, 2, 3, 100):
+            blocks = list(cli.iter_blocks(io.BytesIO(data), size))
+            self.assertEqual(
+                sum(blocks, []), [b"1", b"22", b"333", b"4444"], size)
+        self.assertEqual(list(cli.iter_blocks(io.BytesIO(b""))), [])
+
+    def test_convert_file(self):
+        for workers in (1, 2):
+            output = self.path("output%d.jsonl" % workers)
+            records = cli.convert_file(
+                SCHEMA, self.input, output, workers=workers, block_size=64)
+            self.assertEqual(records, 50)
+            self.assertEqual(self.read(output), self.expected)
+
+        empty = self.path("empty.jsonl")
+        open(empty, "w").close()
+        self.assertEqual(cli.convert_file(
+            SCHEMA, empty, self.path("output.jsonl"), workers=1), 0)
+
+    def test_main(self):
+        schema = self.path("schema.json")
+        with open(schema, "w") as fp:
+            json.dump(SCHEMA, fp)
+        output = self.path("output.jsonl")
+        self.assertEqual(cli.main([
+            schema, self.input, "-o", output, "-j", "1", "--compiled", "-q"]),
+            0)
+        self.assertEqual(self.read(output), self.expected)
+
+    def test_load_schema(self):
+        self.assertIs(
+            cli.load_schema("schemaconvertor.tests.test_cli:SCHEMA"), SCHEMA)
+        with self.assertRaises(ValueError):
+            cli.load_schema(self.path("missing.json"))
+
+    def test_benchmark(self):
+        result = runner.run_jsonlines(100, workers=1)
+        self.assertTrue(result["same_output"])
+        self.assertGreater(result["cli_records_per_sec"], 0)
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+from unittest import TestCase
+from collections import namedtuple
+
+from schemaconvertor import convertor
+from schemaconvertor.compiler import SchemaCompiler, compile_schema
+from schemaconvertor.tests import (
+    test_convertor_0_1, test_convertor_0_2, test_convertor_0_3, test_demo)
+
+Pair = namedtuple("Pair", ["key", "value"])
+
+
+class CompiledSchemaConvertor(convertor.SchemaConvertor):
+
+    def __init__(self, schema, compiled=True):
+        super(CompiledSchemaConvertor, self).__init__(schema, compiled)
+
+
+class CompiledEngineMixin(object):
+    """Run a test case against the compiled engine
+    """
+    modules = (
+        convertor, test_convertor_0_2, test_convertor_0_3)
+    engine = CompiledSchemaConvertor
+
+    def setUp(self):
+        self.origin_convertors = [
+            (m, m.SchemaConvertor) for m in self.modules]
+        for module in self.modules:
+            module.SchemaConvertor = self.engine
+        convertor.convertor_cache.clear()
+        super(CompiledEngineMixin, self).setUp()
+
+    def tearDown(self):
+        super(CompiledEngineMixin, self).tearDown()
+        for module, cvtr in self.origin_convertors:
+            module.SchemaConvertor = cvtr
+        convertor.convertor_cache.clear()
+
+
+class TestCompiledSimple(CompiledEngineMixin, test_convertor_0_1.TestSimple):
+    pass
+
+
+class TestCompiledSchemaConvertor(
+        CompiledEngineMixin, test_convertor_0_2.TestSchemaConvertor):
+    pass
+
+
+class TestCompiledHook(CompiledEngineMixin, test_convertor_0_3.TestHook):
+    pass
+
+
+class TestCompiledUser(CompiledEngineMixin, test_demo.TestUser):
+    pass
+
+
+class TestCompiledBook(CompiledEngineMixin, test_demo.TestBook):
+    pass
+
+
+class TestSchemaCompiler(TestCase):
+
+    def test_engine_patched(self):
+        mixin = TestCompiledSimple("test_raw_type")
+        mixin.setUp()
+        try:
+            cvtr = convertor.SchemaConvertor("string")
+            self.assertIsNotNone(cvtr.compiled_convertor)
+        finally:
+            mixin.tearDown()
+        self.assertIsNone(convertor.SchemaConvertor("string").compiled_convertor)
+
+    def test_source(self):
+        func = compile_schema(convertor.Schema({
+            "type": "object",
+            "properties": {
+                "key": "string",
+                "value": "integer",
+            },
+        }))
+        self.assertIn("getattr(d, 'key'", func.source)
+        self.assertNotIn("_convertor", func.source)
+        self.assertEqual(func(Pair("a", "1")), {"key": "a", "value": 1})
+
+    def test_unknown_type(self):
+        cvtr = convertor.SchemaConvertor({"type": "unknown"}, compiled=True)
+        with self.assertRaises(TypeError):
+            cvtr(1)
+
+    def test_missing_attribute(self):
+        cvtr = convertor.SchemaConvertor({
+            "type": "object",
+            "properties": {"missing": "string"},
+        }, compiled=True)
+        with self.assertRaises(KeyError):
+            cvtr(Pair(1, 2))
+
+    def test_pattern_names(self):
+        class Guarded(object):
+            xa = 1
+
+            @property
+            def secret(self):
+                raise RuntimeError("unmatched attribute fetched")
+
+        schema = {"type": "object", "patternProperties": {"^x": "string"}}
+        for compiled in (False, True):
+            cvtr = convertor.SchemaConvertor(schema, compiled=compiled)
+            self.assertEqual(cvtr(Guarded()), {"xa": "1"})
+
+        cvtr = convertor.SchemaConvertor({
+            "type": "dict",
+            "patternProperties": {"^x": "string", "^y": "integer"},
+        }, compiled=True)
+        self.assertEqual(cvtr({"xa": 1, "yb": "2", "z": 3}),
+                         {"xa": "1", "yb": 2})
+
+    def test_post_convert_hook(self):
+        cvtr = convertor.SchemaConvertor({
+            "type": "raw",
+            "hook": {
+                "post-convert": [lambda d, s: d + 1, lambda d, s: d * 2],
+            },
+        }, compiled=True)
+        self.assertEqual(cvtr(1), 4)
+
+    def test_deep_nesting(self):
+        depth = SchemaCompiler.MAX_BLOCKS * 3
+        schema = "integer"
+        data = 1
+        for _ in range(depth):
+            schema = {"type": "array", "items": schema}
+            data = [data]
+        cvtr = convertor.SchemaConvertor(schema, compiled=True)
+        self.assertEqual(cvtr(data), convertor.SchemaConvertor(schema)(data))
@@ -1,10 +1,79 @@
 #!/usr/bin/env python
 # encoding: utf-8
 
+import re
+import json
+import time
+import threading
+from datetime import datetime
+from decimal import Decimal
+from fractions import Fraction
 from unittest import TestCase
+from collections import namedtuple
+
+try:
+    from unittest import mock
+except ImportError:  # python 2, mock is a separate package there
+    try:
+        import mock
+    except ImportError:
+        mock = None
 
 from schemaconvertor import convertor
 
+try:
+    from threading import Barrier
+except ImportError:  # python 2
+    class Barrier(object):
+        """Cyclic barrier, the wait of threading.Barrier only
+        """
+
+        def __init__(self, parties):
+            self.parties = parties
+            self.count = 0
+            self.generation = 0
+            self.condition = threading.Condition()
+
+        def wait(self, timeout=None):
+            with self.condition:
+                generation = self.generation
+                self.count += 1
+                if self.count == self.parties:
+                    self.count = 0
+                    self.generation += 1
+                    self.condition.notify_all()
+                    return
+                deadline = time.time() + (timeout or 60)
+                while generation == self.generation:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise RuntimeError("barrier timed out")
+                    self.condition.wait(remaining)
+
+
+Pair = namedtuple("Pair", ["key", "value"])
+
+
+class Point(object):
+    __slots__ = ("x", "y")
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+
+class Record(object):
+    kind = "record"
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class Listed(Record):
+
+    def __dir__(self):
+        return ["listed"]
+
 
 class TestObjAsDictAdapter(TestCase):
 
@@ -32,6 +101,81 @@ class TestSchema(TestCase):
         schema.compile()
         schema.compile()  # compile twice
 
+    def test_object_getter(self):
+        schema = convertor.Schema({
+            "type": "object", "properties": {"value": "string"}})
+        getter = schema.object_getter(Pair)
+        self.assertIs(schema.object_getter(Pair), getter)
+        self.assertEqual(list(getter(Pair(1, 2))), [2])
+
+    def test_compile_race(self):
+        class Racing(dict):
+            node = None
+
+            def get(self, key, default=None):
+                if key == "hook" and self.node is not None:
+                    # another thread finishes compiling the node first
+                    node, self.node = self.node, None
+                    node.compile()
+                return super(Racing, self).get(key, default)
+
+        origin = Racing(type="array", items="string")
+        schema = Racing.node = convertor.Schema(origin)
+        schema.compile()
+        self.assertTrue(schema.compiled)
+        self.assertEqual(schema.items.type, "string")
+
+    def test_compile_all(self):
+        schema = convertor.Schema({
+            "type": "array",
+            "items": {
+                "typeOf": {
+                    int: "string",
+                    Pair: {
+                        "type": "object",
+                        "properties": {"key": "string"},
+                        "patternProperties": {"^v": "integer"},
+                    },
+                },
+            },
+        })
+        report = schema.compile_all()
+        # root, items, Pair, ^v and string shared by int, default and key
+        self.assertEqual(report.nodes, 5)
+        self.assertGreaterEqual(report.seconds, 0)
+        pair_schema = schema.items.typeof_schemas[Pair]
+        for sch in (schema, pair_schema, pair_schema.properties("key")):
+            self.assertTrue(sch.compiled)
+
+    def test_warmup(self):
+        cvtr = convertor.SchemaConvertor({
+            "typeOf": {int: "string"},
+        })
+        report = cvtr.warmup(1, True)
+        # int and default share the string node
+        self.assertEqual(report.nodes, 2)
+        self.assertEqual(set(cvtr.schema.typeof_cache), {int, bool})
+
+    def test_slots(self):
+        hooks = {"pre-convert": ["format_date"]}
+        schema = convertor.Schema({
+            "type": "array",
+            "items": {"type": "string", "hook": hooks},
+        })
+        self.assertFalse(hasattr(schema, "__dict__"))
+        schema.compile_all()
+        self.assertIs(schema.pre_convert_hooks, convertor.SchemaConst.S_NO_HOOKS)
+        self.assertIs(schema.typeof_cache, convertor.SchemaConst.S_DISABLED)
+        self.assertEqual(
+            schema.items.hooks["pre-convert"],
+            (convertor.builtin_hooks.format_date,))
+        self.assertEqual(hooks, {"pre-convert": ["format_date"]})
+
+        with self.assertRaises(AttributeError):
+            schema.type = "string"
+        with self.assertRaises(AttributeError):
+            del schema.items
+
     def test_str_method(self):
         description = str(id(self))
         schema = convertor.Schema({"description": description})
@@ -50,3 +194,1149 @@ class TestConvertor(TestCase):
             convertor.SchemaConvertor({
                 "version": "0.0.0.0",
             })
+
+
+class TestStrConvertor(TestCase):
+
+    def test_types(self):
+        class Text(type(u"")):
+            pass
+
+        text = Text(u"text")
+        schema = {
+            "type": "array",
+            "items": {"type": "string", "encoding": "gbk"},
+        }
+        data = [u"中", u"中".encode("gbk"), text, 1, None]
+        for compiled in (False, True):
+            result = convertor.SchemaConvertor(schema, compiled=compiled)(data)
+            self.assertEqual(result, [u"中", u"中", u"text", u"1", u"None"])
+            self.assertIs(result[0], data[0])
+            self.assertIs(result[2], text)
+
+    def test_encoding_disabled(self):
+        schema = convertor.Schema({"type": "string", "encoding": None})
+        data = b"raw"
+        self.assertIs(schema.str_convertor(data), data)
+        self.assertIs(
+            convertor.Schema({}).str_convertor, convertor.SchemaConst.S_DISABLED)
+
+    def test_intern(self):
+        schema = {
+            "type": "array",
+            "items": {"type": "string", "intern": True},
+        }
+        long_value = u"x" * (convertor.INTERN_MAX_LENGTH + 1)
+        for compiled in (False, True):
+            cvtr = convertor.SchemaConvertor(schema, compiled=compiled)
+            first, second, long1, long2 = cvtr(
+                [b"status", b"status", long_value.encode(), long_value.encode()])
+            self.assertEqual(first, u"status")
+            self.assertIs(first, second)
+            self.assertEqual(long1, long_value)
+            self.assertIsNot(long1, long2)
+
+
+class TestNumberConvertor(TestCase):
+    ENGINES = [{}, {"compiled": True}, {"iterative": True}]
+
+    def assertSame(self, result, expected):
+        self.assertEqual(result, expected)
+        self.assertIs(type(result), type(expected))
+
+    def test_values(self):
+        big = 2 ** 63 + 1
+        cases = [
+            (big, big), (u"%d" % big, big), (Decimal(big), big),
+            (Decimal("1.5"), 1.5), (Fraction(4, 2), 2), (Fraction(3, 2), 1.5),
+            (True, 1), (2.0, 2), (2.5, 2.5), (u"1e3", 1000), (u" 7 ", 7),
+            (b"8", 8), (u"0.5", 0.5), (float("inf"), float("inf")),
+            (u"%d" % (2 ** 53 + 1), 2 ** 53 + 1), (u"-1e20", -10 ** 20),
+            (float(2 ** 60), 2 ** 60), (Decimal(2 ** 53) + Decimal("1.5"),
+                                        float(2 ** 53 + 2)),
+        ]
+        data = [value for value, _ in cases]
+        for options in self.ENGINES:
+            result = convertor.SchemaConvertor(
+                {"type": "array", "items": "number"}, **options)(data)
+            for value, (_, expected) in zip(result, cases):
+                self.assertSame(value, expected)
+
+    def test_identity(self):
+        big = 2 ** 70
+        self.assertIs(convertor.to_number(big), big)
+        with self.assertRaises(ValueError):
+            convertor.to_number(u"x")
+        with self.assertRaises(TypeError):
+            convertor.to_number(None)
+
+    def test_batch_column(self):
+        big = 2 ** 60 + 1
+        cvtr = convertor.SchemaConvertor({
+            "type": "array",
+            "items": {"type": "dict", "properties": {"id": "number"}},
+        }, batch=True)
+        result = cvtr([{"id": big}, {"id": u"%d" % big}, {"id": 0.5}])
+        self.assertEqual(result, [{"id": big}, {"id": big}, {"id": 0.5}])
+
+
+class TestHookRegistry(TestCase):
+
+    def setUp(self):
+        self.calls = {"single": 0, "batch": 0}
+
+    def tearDown(self):
+        for stage in ("pre-convert", "post-convert"):
+            hooks = convertor.SchemaBuiltinHook.stage_hooks(stage)
+            if "scale" in hooks:
+                convertor.SchemaBuiltinHook.unregister("scale", stage)
+
+    def scale(self, data, schema):
+        self.calls["single"] += 1
+        return data * 10
+
+    def scale_all(self, data, schema):
+        self.calls["batch"] += 1
+        return [value * 10 for value in data]
+
+    def test_register(self):
+        Hook = convertor.SchemaBuiltinHook
+        Hook.register("scale", self.scale, "post-convert", batch=self.scale_all)
+        self.assertEqual(Hook.Post_Convert_Hook["scale"], self.scale)
+        schema = {
+            "type": "array",
+            "items": {"type": "integer", "hook": {"post-convert": ["scale"]}},
+        }
+        for options in [{}, {"compiled": True}]:
+            self.setUp()
+            cvtr = convertor.SchemaConvertor(schema, **options)
+            self.assertEqual(cvtr([u"1", 2, 3]), [10, 20, 30])
+            self.assertEqual(self.calls, {"single": 0, "batch": 1})
+
+        for options in [{"iterative": True}, {"memo": True}]:
+            self.setUp()
+            cvtr = convertor.SchemaConvertor(schema, **options)
+            self.assertEqual(cvtr([u"1", 2, 3]), [10, 20, 30])
+            self.assertEqual(self.calls, {"single": 3, "batch": 0})
+
+        self.assertEqual(Hook.unregister("scale", "post-convert"), self.scale)
+        self.assertNotIn(self.scale, Hook.Batch_Hook)
+        with self.assertRaises(KeyError):
+            Hook.unregister("scale", "post-convert")
+        with self.assertRaises(ValueError):
+            Hook.register("scale", self.scale, "convert")
+
+    def test_batch_column(self):
+        convertor.SchemaBuiltinHook.register(
+            "scale", self.scale, batch=self.scale_all)
+        cvtr = convertor.SchemaConvertor({
+            "type": "array",
+            "items": {
+                "type": "dict",
+                "properties": {
+                    "a": {"type": "integer", "hook": {"pre-convert": [
+                        "scale", lambda data, schema: data + 1]}},
+                    "b": {"type": "integer", "hook": {"pre-convert": [
+                        "scale", "scale"]}},
+                },
+            },
+        }, batch=True)
+        result = cvtr([{"a": 1, "b": 1}, {"a": 2, "b": 2}])
+        self.assertEqual(result, [{"a": 11, "b": 100}, {"a": 21, "b": 200}])
+        self.assertEqual(self.calls, {"single": 2, "batch": 2})
+
+    def test_builtin_batch(self):
+        date = datetime(2016, 1, 1)
+        schema = {
+            "type": "array",
+            "items": {
+                "type": "string",
+                "hook": {"pre-convert": ["func_result", "format_date"]},
+            },
+        }
+        for compiled in (False, True):
+            cvtr = convertor.SchemaConvertor(schema, compiled=compiled)
+            self.assertEqual(
+                cvtr([lambda: date]), [u"2016-01-01T00:00:00"])
+            items = cvtr.schema.items
+            self.assertIsNot(items.batch_hooks, convertor.SchemaConst.S_DISABLED)
+            self.assertIsNone(items.post_convert_chain)
+
+    def test_chain(self):
+        schema = convertor.Schema({"type": "integer", "hook": {
+            "pre-convert": [lambda data, schema: data + 1],
+            "post-convert": [lambda data, schema: data * 2,
+                             lambda data, schema: data - 1],
+        }})
+        self.assertIs(schema.pre_convert_chain, schema.pre_convert_hooks[0])
+        self.assertIs(schema.batch_hooks, convertor.SchemaConst.S_DISABLED)
+        self.assertEqual(convertor.SchemaConvertor(schema)(1), 3)
+
+
+class UnhashableHook(object):
+    __hash__ = None
+
+    def __call__(self, data, schema):
+        return data + 1
+
+
+class TestSchemaConvertorCache(TestCase):
+
+    def test_identity_hit(self):
+        if mock is None:
+            self.skipTest("mock is not installed")
+
+        schema = {"type": "array", "items": "string"}
+        fingerprint = convertor.schema_fingerprint
+        with mock.patch.object(
+                convertor, "schema_fingerprint",
+                side_effect=fingerprint) as counted:
+            cache = convertor.SchemaConvertorCache(identity=True)
+            cvtr = cache.get(schema)
+            counted.reset_mock()
+            self.assertIs(cache.get(schema), cvtr)
+            self.assertFalse(counted.called)
+            self.assertIs(cache.get(dict(schema)), cvtr)
+            self.assertTrue(counted.called)
+            self.assertEqual(cache.stats()["hits"], 2)
+
+            # without identity every call fingerprints the schema
+            cache = convertor.SchemaConvertorCache()
+            cache.get(schema)
+            counted.reset_mock()
+            self.assertIs(cache.get(schema).schema.origin_schema, schema)
+            self.assertTrue(counted.called)
+
+    def test_changed_in_place(self):
+        schema = {"type": "array", "items": "string"}
+        cache = convertor.SchemaConvertorCache()
+        self.assertEqual(cache.get(schema)([1]), ["1"])
+        schema["items"] = "integer"
+        self.assertEqual(cache.get(schema)(["1"]), [1])
+
+        cache = convertor.SchemaConvertorCache(identity=True)
+        cvtr = cache.get(schema)
+        schema["items"] = "string"
+        self.assertIs(cache.get(schema), cvtr)
+
+    def test_threads(self):
+        errors = []
+        schema = {
+            "type": "array",
+            "items": {
+                "type": "dict",
+                "properties": dict(
+                    ("p%d" % i, {"type": "array", "items": "string"})
+                    for i in range(20)),
+            },
+        }
+        data = [dict(("p%d" % i, [i]) for i in range(20))]
+        expected = convertor.SchemaConvertor(schema)(data)
+        cache = convertor.SchemaConvertorCache()
+        barrier = Barrier(8)
+
+        def convert():
+            barrier.wait()
+            try:
+                self.assertEqual(cache.get(schema)(data), expected)
+            except Exception as err:
+                errors.append(err)
+
+        threads = [threading.Thread(target=convert) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        nodes = cache.get(schema).schema.registry.nodes
+        self.assertTrue(all(node.compiled for node in nodes.values()))
+
+    def test_equal_schemas_share_entry(self):
+        cache = convertor.SchemaConvertorCache()
+        cvtr = cache.get({"type": "array", "items": "integer"})
+        self.assertIs(cache.get({"items": "integer", "type": "array"}), cvtr)
+        self.assertIsNot(cache.get({"type": "array", "items": "float"}), cvtr)
+        self.assertIs(cache.get("string"), cache.get({"type": "string"}))
+        self.assertEqual(cache.stats()["hits"], 2)
+        self.assertEqual(cache.stats()["misses"], 3)
+
+    def test_mapping_order(self):
+        cache = convertor.SchemaConvertorCache()
+        cvtr1 = cache.get({"typeOf": {int: "string", bool: "integer"}})
+        cvtr2 = cache.get({"typeOf": {bool: "integer", int: "string"}})
+        self.assertIsNot(cvtr1, cvtr2)
+
+    def test_options(self):
+        cache = convertor.SchemaConvertorCache()
+        cvtr = cache.get("integer")
+        compiled_cvtr = cache.get("integer", compiled=True)
+        self.assertIsNot(cvtr, compiled_cvtr)
+        self.assertIsNotNone(compiled_cvtr.compiled_convertor)
+
+    def test_eviction(self):
+        cache = convertor.SchemaConvertorCache(maxsize=2)
+        cvtr = cache.get("integer")
+        cache.get("float")
+        cache.get("integer")
+        cache.get("string")
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.evictions, 1)
+        self.assertIs(cache.get("integer"), cvtr)
+
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.stats()["hits"], 0)
+
+    def test_builtin_hook_name(self):
+        cache = convertor.SchemaConvertorCache()
+        schema = {
+            "type": "string",
+            "hook": {"pre-convert": ["func_result"]},
+        }
+        cvtr = cache.get(schema)
+        self.assertEqual(cvtr(lambda: 1), "1")
+        self.assertIs(cache.get(schema), cvtr)
+        self.assertIs(cache.get({
+            "type": "string",
+            "hook": {"pre-convert": ["func_result"]},
+        }), cvtr)
+
+    def test_unhashable_hook(self):
+        cache = convertor.SchemaConvertorCache()
+        hook = UnhashableHook()
+        cvtr = cache.get({
+            "type": "integer",
+            "hook": {"pre-convert": [hook]},
+        })
+        self.assertEqual(cvtr(1), 2)
+        self.assertIs(cache.get({
+            "type": "integer",
+            "hook": {"pre-convert": [hook]},
+        }), cvtr)
+        self.assertIsNot(cache.get({
+            "type": "integer",
+            "hook": {"pre-convert": [UnhashableHook()]},
+        }), cvtr)
+
+    def test_convert_by_schema(self):
+        convertor.convertor_cache.clear()
+        convertor.convert_by_schema(1, {"type": "string"})
+        self.assertEqual(convertor.convert_by_schema(2, {"type": "string"}), "2")
+        self.assertEqual(convertor.convertor_cache.hits, 1)
+        convertor.convertor_cache.clear()
+
+
+class TestLazyConvertor(TestCase):
+    schema = {
+        "type": "array",
+        "items": {
+            "type": "array",
+            "items": "string",
+        },
+    }
+
+    def rows(self, count):
+        # range of python 2 is a list
+        i = 0
+        while i < count:
+            yield [i, i + 1]
+            i += 1
+
+    def test_lazy(self):
+        for compiled in (False, True):
+            cvtr = convertor.SchemaConvertor(
+                self.schema, compiled=compiled, lazy=True)
+            result = cvtr(self.rows(3))
+            self.assertNotIsInstance(result, list)
+            self.assertEqual(
+                [list(row) for row in result],
+                [["0", "1"], ["1", "2"], ["2", "3"]])
+
+            cvtr = convertor.SchemaConvertor(
+                {"type": "array"}, compiled=compiled, lazy=True)
+            self.assertEqual(list(cvtr([1])), [])
+
+    def test_iter(self):
+        for compiled in (False, True):
+            cvtr = convertor.SchemaConvertor(self.schema, compiled=compiled)
+            rows = cvtr.iter(self.rows(10 ** 9))
+            self.assertEqual(next(rows), ["0", "1"])
+            self.assertEqual(next(rows), ["1", "2"])
+
+            cvtr = convertor.SchemaConvertor(
+                self.schema, compiled=compiled, lazy=True)
+            self.assertEqual(list(next(cvtr.iter(self.rows(1)))), ["0", "1"])
+
+    def test_iter_hooks(self):
+        cvtr = convertor.SchemaConvertor({
+            "type": "array",
+            "items": "integer",
+            "hook": {
+                "pre-convert": ["func_result"],
+                "post-convert": [lambda r, s: (i * 2 for i in r)],
+            },
+        })
+        self.assertEqual(list(cvtr.iter(lambda: ["1", "2"])), [2, 4])
+
+    def test_iter_type(self):
+        cvtr = convertor.SchemaConvertor("string")
+        with self.assertRaises(convertor.FieldTypeError):
+            cvtr.iter([])
+
+
+class TestObjectShape(TestCase):
+
+    def test_names(self):
+        for obj in (
+                Pair(1, 2), Point(1, 2), Record(), Record(a=1, z=2),
+                Record(z=2, a=1), Listed(listed=1)):
+            shape = convertor.ObjectShape.of(type(obj))
+            self.assertEqual(shape.names(obj), dir(obj))
+            self.assertEqual(shape.names(obj), dir(obj))  # cached
+
+    def test_shared(self):
+        shape = convertor.ObjectShape.of(Record)
+        self.assertIs(convertor.ObjectShape.of(Record), shape)
+        self.assertFalse(shape.slotted)
+        self.assertTrue(convertor.ObjectShape.of(Point).slotted)
+        self.assertTrue(convertor.ObjectShape.of(Pair).slotted)
+
+    def test_getter(self):
+        getter = convertor.ObjectShape.of(Pair).getter(["value", "key"])
+        self.assertEqual(getter(Pair(1, 2)), (2, 1))
+        getter = convertor.ObjectShape.of(Pair).getter(["key", "__doc__"])
+        self.assertEqual(getter(Pair(1, 2)), (1, Pair.__doc__))
+        getter = convertor.ObjectShape.of(Point).getter(["y"])
+        self.assertEqual(getter(Point(1, 2)), (2,))
+        getter = convertor.ObjectShape.of(Record).getter([])
+        self.assertEqual(getter(Record()), ())
+
+    def test_getter_missing(self):
+        point = Point(1, 2)
+        del point.y
+        getter = convertor.ObjectShape.of(Point).getter(["x", "y"])
+        with self.assertRaises(KeyError) as ctx:
+            getter(point)
+        self.assertEqual(ctx.exception.args, ("y",))
+
+    def test_convert(self):
+        cvtr = convertor.SchemaConvertor({
+            "type": "object",
+            "properties": {"x": "string"},
+            "patternProperties": {"^[a-z]$": "integer"},
+        })
+        self.assertEqual(cvtr(Point(1, "2")), {"x": "1", "y": 2})
+        self.assertEqual(cvtr(Record(x=1, b="3")), {"x": "1", "b": 3})
+        self.assertEqual(cvtr(Record(x=1)), {"x": "1"})
+
+
+class TestPatternMatcher(TestCase):
+
+    def matcher(self, *patterns):
+        return convertor.PatternMatcher(
+            (re.compile(p), p) for p in patterns)
+
+    def test_precedence(self):
+        matcher = self.matcher("[0-9]", "[a-z]", "^X")
+        self.assertIsNotNone(matcher.combined)
+        # the first declared pattern wins, not the leftmost match
+        self.assertEqual(matcher.match("a1"), "[0-9]")
+        self.assertEqual(matcher.match("x"), "[a-z]")
+        self.assertEqual(matcher.match("X"), "^X")
+        self.assertIsNone(matcher.match("_"))
+
+        matcher = self.matcher(r"^\w+_cnt$", "^[a-z]+$", r"_(val|num)$")
+        self.assertEqual(matcher.match("visited_cnt"), r"^\w+_cnt$")
+        self.assertEqual(matcher.match("attr"), "^[a-z]+$")
+        self.assertEqual(matcher.match("a_num"), r"_(val|num)$")
+        self.assertIsNone(matcher.match("a_num\n_"))
+
+    def test_fallback(self):
+        matcher = self.matcher(r"(a)\1", "(?i)b")
+        self.assertIsNone(matcher.combined)
+        self.assertEqual(matcher.match("xaa"), r"(a)\1")
+        self.assertEqual(matcher.match("B"), "(?i)b")
+        self.assertIsNone(matcher.match("a"))
+
+    def test_memo(self):
+        matcher = self.matcher("a")
+        matcher.MEMO_SIZE = 2
+        self.assertEqual(matcher.match("a"), "a")
+        self.assertIsNone(matcher.match("b"))
+        self.assertEqual(matcher.memo, {"a": "a", "b": None})
+        matcher.match("c")
+        self.assertEqual(matcher.memo, {"c": None})
+
+
+class Admin(Record):
+    pass
+
+
+class SuperAdmin(Admin):
+    pass
+
+
+class TestTypeofCache(TestCase):
+
+    def test_mro(self):
+        record = Record()
+        for compiled in (False, True):
+            cvtr = convertor.SchemaConvertor({
+                "type": "array",
+                "items": {
+                    "typeOf": {
+                        Record: "string",
+                        (int, Admin): "boolean",
+                        convertor.Mapping: "null",
+                        "default": "string",
+                    },
+                },
+            }, compiled=compiled)
+            self.assertEqual(
+                cvtr([record, SuperAdmin(), True, "1", {}, 1.5]),
+                [str(record), True, True, "1", None, "1.5"])
+            schema = cvtr.schema.items
+            self.assertIs(schema.typeof_cache[SuperAdmin],
+                          schema.typeof_cache[bool])
+            self.assertIs(schema.typeof_cache[dict],
+                          schema.typeof_schemas[convertor.Mapping])
+            self.assertIs(schema.typeof_cache[float],
+                          schema.typeof_default_schema)
+
+    def test_invalidate(self):
+        schema = convertor.Schema({"typeOf": {int: "string"}})
+        cvtr = convertor.SchemaConvertor(schema)
+        self.assertEqual(cvtr(True), "True")
+        schema.typeof_schemas[bool] = schema.subschema("integer")
+        self.assertEqual(cvtr(True), "True")
+        schema.invalidate_typeof_cache()
+        self.assertEqual(cvtr(True), 1)
+        convertor.Schema("string").invalidate_typeof_cache()
+
+
+class TestConcurrentHooks(TestCase):
+
+    def loader(self, barrier):
+        def _loader(data, schema):
+            if barrier is not None:
+                barrier.wait(timeout=5)
+            return data * 2
+        return _loader
+
+    def test_array(self):
+        barrier = Barrier(4)
+        cvtr = convertor.SchemaConvertor({
+            "type": "array",
+            "items": {
+                "type": "string",
+                "hook": {
+                    "pre-convert": [self.loader(barrier)],
+                    "post-convert": [lambda data, schema: data + "!"],
+                    "concurrent": True,
+                },
+            },
+        }, hook_workers=4)
+        # all four loaders must be waiting at the same time
+        self.assertEqual(cvtr([1, 2, 3, 4]), ["2!", "4!", "6!", "8!"])
+
+    def test_properties(self):
+        barrier = Barrier(2)
+        loaded = {
+            "type": "integer",
+            "hook": {"pre-convert": [self.loader(barrier)], "concurrent": True},
+        }
+        schema = {
+            "type": "object",
+            "properties": {"key": loaded, "value": loaded},
+            "patternProperties": {"^k": "string"},
+        }
+        cvtr = convertor.SchemaConvertor(schema, hook_workers=2)
+        self.assertEqual(cvtr(Pair("1", "2")), {"key": 11, "value": 22})
+
+        schema["type"] = "dict"
+        cvtr = convertor.SchemaConvertor(schema, hook_workers=2)
+        self.assertEqual(
+            cvtr({"key": "1", "value": "2", "kk": 3}),
+            {"key": 11, "value": 22, "kk": "3"})
+
+    def test_sequential_schema(self):
+        cvtr = convertor.SchemaConvertor({
+            "type": "array",
+            "items": {
+                "type": "string",
+                "hook": {"pre-convert": ["func_result"]},
+            },
+        }, hook_workers=2)
+        self.assertEqual(cvtr([lambda: 1]), ["1"])
+
+    def test_compiled(self):
+        with self.assertRaises(ValueError):
+            convertor.SchemaConvertor("string", compiled=True, hook_workers=2)
+
+    def test_close(self):
+        schema = {
+            "type": "array",
+            "items": {
+                "type": "string",
+                "hook": {
+                    "pre-convert": [self.loader(None)],
+                    "concurrent": True,
+                },
+            },
+        }
+        with convertor.SchemaConvertor(schema, hook_workers=2) as cvtr:
+            self.assertIsNone(cvtr.hook_executor)
+            self.assertEqual(cvtr([1, 2]), ["2", "4"])
+            executor = cvtr.hook_executor
+            self.assertIsNotNone(executor)
+            self.assertEqual(cvtr([3]), ["6"])
+            self.assertIs(cvtr.hook_executor, executor)
+        self.assertIsNone(cvtr.hook_executor)
+        with self.assertRaises(RuntimeError):
+            executor.submit(str, 1)
+
+        # a closed convertor starts a new pool when used again
+        self.assertEqual(cvtr([4]), ["8"])
+        self.assertIsNot(cvtr.hook_executor, executor)
+        cvtr.close()
+        cvtr.close()
+
+
+class TestBatchConvertor(TestCase):
+
+    schema = {
+        "type": "array",
+        "items": {
+            "type": "object",
+            "properties": {
+                "key": "string",
+                "value": "integer",
+            },
+        },
+    }
+
+    def test_rows(self):
+        data = [Pair(1, "2"), Pair(b"3", 4.5), Point(5, 6)]
+        schema = dict(self.schema, items=dict(
+            self.schema["items"], properties={"x": "number", "y": "raw"}))
+        for schema, data in [(self.schema, data[:2]), (schema, data[2:])]:
+            cvtr = convertor.SchemaConvertor(schema, batch=True)
+            self.assertEqual(cvtr(data), convertor.SchemaConvertor(schema)(data))
+        self.assertEqual(
+            convertor.SchemaConvertor(self.schema, batch=True)([]), [])
+
+    def test_dict_rows(self):
+        schema = {
+            "type": "array",
+            "items": {
+                "type": "dict",
+                "properties": {
+                    "a": {"type": "float"},
+                    "b": {"type": "null"},
+                    "c": {
+                        "type": "string",
+                        "hook": {"post-convert": [lambda d, s: d + "!"]},
+                    },
+                    "d": {"type": "array", "items": "boolean"},
+                },
+            },
+        }
+        data = [{"a": i, "b": i, "c": i, "d": [i]} for i in range(3)]
+        cvtr = convertor.SchemaConvertor(schema, batch=True)
+        self.assertEqual(cvtr(data), convertor.SchemaConvertor(schema)(data))
+        with self.assertRaises(KeyError):
+            cvtr([{"a": 1}])
+
+        single = {"type": "array", "items": {
+            "type": "dict", "properties": {"a": "integer"}}}
+        cvtr = convertor.SchemaConvertor(single, batch=True)
+        self.assertEqual(cvtr([{"a": "1"}, {"a": 2}]), [{"a": 1}, {"a": 2}])
+
+    def test_fallback(self):
+        schema = {
+            "type": "array",
+            "items": {
+                "type": "dict",
+                "properties": {"a": "integer"},
+                "patternProperties": {"^b": "string"},
+            },
+        }
+        cvtr = convertor.SchemaConvertor(schema, batch=True)
+        self.assertEqual(cvtr([{"a": "1", "b": 2}]), [{"a": 1, "b": "2"}])
+        self.assertEqual(
+            convertor.SchemaConvertor(
+                {"type": "array", "items": "integer"}, batch=True)(["1"]),
+            [1])
+
+    def test_columns(self):
+        cvtr = convertor.SchemaConvertor(self.schema)
+        self.assertEqual(
+            cvtr.columns([Pair(1, "2"), Pair(3, "4")]),
+            {"key": ["1", "3"], "value": [2, 4]})
+        self.assertEqual(cvtr.columns([]), {"key": [], "value": []})
+        with self.assertRaises(convertor.FieldTypeError):
+            convertor.SchemaConvertor(self.schema["items"]).columns([])
+
+    def test_compiled(self):
+        with self.assertRaises(ValueError):
+            convertor.SchemaConvertor(self.schema, compiled=True, batch=True)
+
+
+class TestTypedArray(TestCase):
+
+    def test_array(self):
+        from schemaconvertor import typed
+
+        cvtr = convertor.SchemaConvertor({
+            "type": "array",
+            "items": {"type": "array", "items": "integer"},
+        }, typed=True)
+        result = cvtr([["1", 2.5], (i for i in range(3))])
+        self.assertEqual([list(r) for r in result], [[1, 2], [0, 1, 2]])
+        if typed.numpy is None:
+            self.assertEqual(result[0].typecode, typed.TYPECODES["integer"])
+        else:
+            self.assertEqual(result[0].dtype, typed.numpy.int64)
+
+        cvtr = convertor.SchemaConvertor(
+            {"type": "array", "items": "number"}, typed=True)
+        self.assertEqual(list(cvtr(["1.5", 2])), [1.5, 2.0])
+
+    def test_fallback(self):
+        cvtr = convertor.SchemaConvertor(
+            {"type": "array", "items": "integer"}, typed=True)
+        self.assertEqual(cvtr([1, 2 ** 64]), [1, 2 ** 64])
+        with self.assertRaises(ValueError):
+            cvtr([1, "x"])
+        with self.assertRaises(TypeError):
+            cvtr([[1]])
+
+        cvtr = convertor.SchemaConvertor({
+            "type": "array",
+            "items": {
+                "type": "float",
+                "hook": {"post-convert": [lambda data, schema: data * 2]},
+            },
+        }, typed=True)
+        self.assertEqual(cvtr([1]), [2.0])
+
+        cvtr = convertor.SchemaConvertor({
+            "type": "array",
+            "items": {
+                "type": "dict",
+                "properties": {"a": {"type": "array", "items": "float"}},
+            },
+        }, typed=True, batch=True)
+        self.assertEqual(list(cvtr([{"a": [1]}])[0]["a"]), [1.0])
+
+    def test_numpy(self):
+        from schemaconvertor import typed
+        if typed.numpy is None:
+            self.skipTest("numpy is not installed")
+
+        cvtr = convertor.SchemaConvertor(
+            {"type": "array", "items": "integer"}, typed=True)
+        result = cvtr(typed.numpy.array([1.5, 2.5]))
+        self.assertEqual(result.dtype, typed.numpy.int64)
+        self.assertEqual(list(result), [1, 2])
+        with self.assertRaises(ValueError):
+            cvtr(typed.numpy.array([1.5, float("nan")]))
+
+        # values int64 can not hold are converted item by item
+        big = typed.numpy.array([1, 2 ** 63 + 1], dtype=typed.numpy.uint64)
+        self.assertEqual(cvtr(big), [1, 2 ** 63 + 1])
+        self.assertEqual(cvtr(typed.numpy.array([1.0, 1e19])), [1, 10 ** 19])
+        self.assertNumbers(typed)
+
+        cvtr = convertor.SchemaConvertor(
+            {"type": "array", "items": "number"}, typed=True)
+        self.assertEqual(
+            cvtr(typed.numpy.array([1, 2])).dtype, typed.numpy.int64)
+        self.assertEqual(
+            cvtr(typed.numpy.array([1.5, 2])).dtype, typed.numpy.float64)
+        self.assertEqual(
+            cvtr(typed.numpy.array([2 ** 64 - 1], dtype=typed.numpy.uint64)),
+            [2 ** 64 - 1])
+
+    def test_array_fallback(self):
+        from schemaconvertor import typed
+
+        numpy, typed.numpy = typed.numpy, None
+        try:
+            result = typed.typed_array(["1", 2.5], "integer")
+            self.assertEqual(result.typecode, typed.TYPECODES["integer"])
+            self.assertEqual(list(result), [1, 2])
+            for value in (2 ** 63, -2 ** 63 - 1, 1e19, float("inf")):
+                self.assertIsNone(typed.typed_array([1, value], "integer"))
+            self.assertNumbers(typed)
+        finally:
+            typed.numpy = numpy
+
+    def assertNumbers(self, typed):
+        big = 12345678901234567891
+        cvtr = convertor.SchemaConvertor(
+            {"type": "array", "items": "number"}, typed=True)
+        for data in ([1, "2", 3.0], [1.5, 2], [big], [1.5, 2 ** 53]):
+            # int and float compare exactly, rounded integers differ
+            self.assertEqual(
+                list(cvtr(data)),
+                [convertor.to_number(item) for item in data])
+
+        ints = typed.typed_array([1, "2", 3.0], "number")
+        floats = typed.typed_array([1.5, 2], "number")
+        if typed.numpy is None:
+            self.assertEqual(ints.typecode, typed.TYPECODES["integer"])
+            self.assertEqual(floats.typecode, "d")
+        else:
+            self.assertEqual(ints.dtype, typed.numpy.int64)
+            self.assertEqual(floats.dtype, typed.numpy.float64)
+        # floats can not hold them exactly, the scalar path keeps them
+        self.assertIsNone(typed.typed_array([1.5, 2 ** 53], "number"))
+        self.assertIs(type(cvtr([1.5, big])), list)
+        self.assertEqual(cvtr([1.5, big])[1], big)
+
+    def test_compiled(self):
+        with self.assertRaises(ValueError):
+            convertor.SchemaConvertor("integer", compiled=True, typed=True)
+
+    def test_array_options(self):
+        schema = {"type": "array", "items": "integer"}
+        for options in [
+                {"typed": True, "hook_workers": 2},
+                {"batch": True, "hook_workers": 2},
+                {"typed": True, "lazy": True},
+                {"batch": True, "lazy": True},
+                {"lazy": True, "hook_workers": 2}]:
+            with self.assertRaises(ValueError):
+                convertor.SchemaConvertor(schema, **options)
+
+        cvtr = convertor.SchemaConvertor(schema, typed=True, memo=True)
+        self.assertEqual(list(cvtr(["1", 2])), [1, 2])
+        self.assertIsNot(type(cvtr(["1", 2])), list)
+
+
+class TestSchemaRef(TestCase):
+
+    tree_schema = {
+        "definitions": {
+            "Node": {
+                "type": "dict",
+                "properties": {
+                    "value": "integer",
+                    "children": {
+                        "type": "array",
+                        "items": {"$ref": "#/definitions/Node"},
+                    },
+                },
+            },
+        },
+        "$ref": "#/definitions/Node",
+    }
+
+    def test_recursive(self):
+        tree = {"value": "1", "children": [
+            {"value": 2, "children": []},
+            {"value": "3", "children": [{"value": 4, "children": []}]},
+        ]}
+        expected = {"value": 1, "children": [
+            {"value": 2, "children": []},
+            {"value": 3, "children": [{"value": 4, "children": []}]},
+        ]}
+        for compiled in (False, True):
+            cvtr = convertor.SchemaConvertor(
+                {"type": "array", "items": {"$ref": "#/definitions/Node"},
+                 "definitions": self.tree_schema["definitions"]},
+                compiled=compiled)
+            self.assertEqual(cvtr([tree]), [expected])
+        # root, Node, value, children
+        self.assertEqual(cvtr.schema.compile_all().nodes, 4)
+
+        for compiled in (False, True):
+            cvtr = convertor.SchemaConvertor(
+                self.tree_schema, compiled=compiled)
+            self.assertEqual(cvtr(tree), expected)
+        # the root is the Node, shared by the children items
+        self.assertIs(cvtr.schema.properties("children").items, cvtr.schema)
+        self.assertEqual(cvtr.schema.compile_all().nodes, 3)
+
+        for compiled in (False, True):
+            cvtr = convertor.SchemaConvertor({
+                "typeOf": {
+                    dict: {
+                        "type": "dict",
+                        "properties": {"next": {"$ref": "#"}, "value": "string"},
+                    },
+                    "default": "null",
+                },
+            }, compiled=compiled)
+            self.assertEqual(
+                cvtr({"value": 1, "next": {"value": 2, "next": 3}}),
+                {"value": "1", "next": {"value": "2", "next": None}})
+        node = cvtr.schema.typeof_schemas[dict]
+        self.assertIs(node.properties("next"), cvtr.schema)
+
+    def test_interning(self):
+        user = {"type": "dict", "properties": {"name": "string"}}
+        schema = convertor.Schema({
+            "type": "dict",
+            "properties": dict(
+                ("user%d" % i, dict(user)) for i in range(10)),
+            "patternProperties": {"^x": {"type": "string"}},
+        })
+        users = set(map(schema.properties, schema.properties_schemas))
+        self.assertEqual(len(users), 1)
+        # root, user and string shared by name and ^x
+        self.assertEqual(schema.compile_all().nodes, 3)
+        self.assertEqual(len(schema.registry), 3)
+
+        schema = convertor.Schema({
+            "type": "dict",
+            "properties": {
+                "a": "string",
+                "b": {"type": "dict", "encoding": "gbk",
+                      "properties": {"c": "string"}},
+            },
+        })
+        c = schema.properties("b").properties("c")
+        self.assertIsNot(schema.properties("a"), c)
+        self.assertEqual(c.encoding, "gbk")
+
+    def test_flat_keys(self):
+        deep = "string"
+        for _ in range(5):
+            deep = {"type": "array", "items": deep}
+        registry = convertor.Schema(deep).registry
+        ident = registry.key(deep, None)[0]
+        self.assertIsInstance(ident, int)
+        self.assertEqual(registry.key(dict(deep), None)[0], ident)
+        # the fingerprint of the parent holds the int of its child
+        fingerprints = dict((i, f) for f, i in registry.interned.items())
+        self.assertIn(
+            registry.key(deep["items"], None)[0],
+            [value for _, value in fingerprints[ident]])
+
+    def test_errors(self):
+        for ref in ("#/definitions/Missing", "other.json#/A", "#/type/x"):
+            schema = convertor.Schema({"type": "array", "items": {"$ref": ref}})
+            with self.assertRaises(convertor.SchemaRefError):
+                schema.items
+        schema = convertor.Schema({
+            "type": "array",
+            "items": {"$ref": "#/definitions/A"},
+            "definitions": {"A": {"$ref": "#/definitions/A"}},
+        })
+        with self.assertRaises(convertor.SchemaRefError):
+            schema.items
+        for ref in ("#/definitions/Missing", "#"):
+            with self.assertRaises(convertor.SchemaRefError):
+                convertor.SchemaConvertor({"$ref": ref})(1)
+
+    def test_root_ref(self):
+        schema = {"definitions": {"id": "integer"}, "$ref": "#/definitions/id"}
+        self.assertEqual(convertor.SchemaConvertor(schema)("1"), 1)
+        self.assertEqual(convertor.convert_by_schema("2", schema), 2)
+
+
+class TestMemo(TestCase):
+
+    schema = {
+        "type": "array",
+        "items": {
+            "type": "object",
+            "properties": {
+                "key": "string",
+                "value": {
+                    "type": "object",
+                    "properties": {"x": "integer", "y": "integer"},
+                },
+            },
+        },
+    }
+
+    def test_shared_objects(self):
+        calls = []
+
+        def count(data, schema):
+            calls.append(data)
+            return data
+
+        schema = dict(self.schema)
+        schema["items"] = dict(schema["items"], hook={"pre-convert": [count]})
+        point = Point(1, "2")
+        data = [Pair("a", point), Pair("b", point)] * 3
+        cvtr = convertor.SchemaConvertor(schema, memo=True)
+        result = cvtr(data)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(result, convertor.SchemaConvertor(schema)(data))
+        del calls[:]
+        self.assertIs(result[0]["value"], result[1]["value"])
+        self.assertIs(result[0], result[2])
+
+        # the memo lives as long as one call
+        self.assertIsNot(cvtr(data)[0], result[0])
+        self.assertEqual(len(calls), 2)
+        self.assertIsNone(cvtr.memo_state.state)
+
+    def test_circular(self):
+        schema = {
+            "typeOf": {
+                list: {"type": "array", "items": {"$ref": "#"}},
+                "default": "integer",
+            },
+        }
+        data = [1, [2]]
+        cvtr = convertor.SchemaConvertor(schema, memo=True)
+        self.assertEqual(cvtr(data), [1, [2]])
+        data[1].append(data)
+        with self.assertRaises(convertor.CircularReferenceError):
+            cvtr(data)
+        self.assertIsNone(cvtr.memo_state.state)
+
+    def test_compiled(self):
+        with self.assertRaises(ValueError):
+            convertor.SchemaConvertor(self.schema, compiled=True, memo=True)
+
+    def test_threads(self):
+        barrier = Barrier(4)
+
+        def wait(data, schema):
+            barrier.wait(5)
+            return data
+
+        schema = dict(self.schema)
+        schema["items"] = dict(schema["items"], hook={"pre-convert": [wait]})
+        cvtr = convertor.SchemaConvertor(schema, memo=True)
+        point = Point(1, "2")
+        data = [Pair("a", point), Pair("b", point)]
+        expected = convertor.SchemaConvertor(self.schema)(data)
+        results, errors = [], []
+
+        def convert():
+            try:
+                for _ in range(2):
+                    results.append(cvtr(data))
+            except Exception as err:
+                errors.append(err)
+
+        threads = [threading.Thread(target=convert) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(results, [expected] * 8)
+        for result in results:
+            self.assertIs(result[0]["value"], result[1]["value"])
+
+
+class Guarded(object):
+    """Object whose secret must not be read
+    """
+
+    def __init__(self, name, owners=()):
+        self.name = name
+        self.owners = list(owners)
+
+    @property
+    def secret(self):
+        raise AssertionError("pruned attribute fetched")
+
+
+class TestFieldMask(TestCase):
+
+    schema = {
+        "type": "object",
+        "properties": {
+            "name": "string",
+            "secret": "string",
+            "owners": {
+                "type": "array",
+                "items": {
+                    "typeOf": {
+                        Guarded: {"$ref": "#"},
+                        "default": "string",
+                    },
+                },
+            },
+        },
+        "patternProperties": {"^s": "string", "^n": "raw"},
+    }
+
+    def test_parse(self):
+        mask = convertor.FieldMask(["a.b", "a.c", "d", "d.e", "f.g", "f"])
+        self.assertEqual(mask.fields(), ["a.b", "a.c", "d", "f"])
+        self.assertEqual(mask, convertor.FieldMask(["f", "d", "a.c", "a.b"]))
+        self.assertEqual(
+            hash(mask), hash(convertor.FieldMask(["f", "d", "a.c", "a.b"])))
+        self.assertNotEqual(mask, convertor.FieldMask(["a"]))
+
+    def test_only(self):
+        data = Guarded("a", [Guarded("b", [1]), 2])
+        cvtr = convertor.SchemaConvertor(self.schema)
+        self.assertEqual(cvtr(data, only=["name"]), {"name": "a"})
+        self.assertEqual(
+            cvtr(data, only=["owners.name", "owners.owners"]),
+            {"owners": [{"name": "b", "owners": ["1"]}, "2"]})
+
+        with self.assertRaises(AssertionError):
+            cvtr(data)
+
+    def test_cached_views(self):
+        cvtr = convertor.SchemaConvertor(self.schema)
+        view = cvtr.masked_schema(["name", "owners.name"])
+        self.assertIs(view, cvtr.masked_schema(
+            convertor.FieldMask(["owners.name", "name"])))
+        self.assertEqual(sorted(view.properties_schemas), ["name", "owners"])
+        self.assertIs(view.properties("name"), cvtr.schema.properties("name"))
+        self.assertTrue(view.compiled)
+        with self.assertRaises(AttributeError):
+            view.type = "dict"
+        # the original tree is untouched
+        self.assertEqual(len(cvtr.schema.properties_schemas), 3)
+
+    def test_pattern_names(self):
+        data = Guarded("a", [Guarded("b")])
+        schema = {
+            "type": "object",
+            "patternProperties": {
+                "^(name|secret)$": {
+                    "type": "string",
+                    "hook": {"concurrent": True},
+                },
+                "^owners$": {
+                    "type": "array",
+                    "items": {"$ref": "#"},
+                },
+            },
+        }
+        expected = {"name": "a", "owners": [{"name": "b"}]}
+        cvtr = convertor.SchemaConvertor(schema, hook_workers=2)
+        self.assertEqual(cvtr(data, only=["name", "owners.name"]), expected)
+        self.assertEqual(
+            json.loads("".join(
+                cvtr.iter_encode(data, only=["name", "owners.name"]))),
+            expected)
+
+        with self.assertRaises(AssertionError):
+            cvtr(data)
+        with self.assertRaises(AssertionError):
+            list(cvtr.iter_encode(data))
+
+    def test_engines(self):
+        data = [{"a": 1, "b": 2, "c": {"d": 3, "e": 4}}]
+        schema = {
+            "type": "array",
+            "items": {
+                "type": "dict",
+                "properties": {"a": "integer", "b": "integer"},
+                "patternProperties": {
+                    "^c": {"type": "dict", "properties": {
+                        "d": "string", "e": "string"}},
+                },
+            },
+        }
+        expected = [{"a": 1, "c": {"d": "3"}}]
+        for options in ({"compiled": True}, {"iterative": True},
+                        {"memo": True}):
+            cvtr = convertor.SchemaConvertor(schema, **options)
+            self.assertEqual(cvtr(data, only=["a", "c.d"]), expected)
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from schemaconvertor import diskcache
+from schemaconvertor.convertor import SchemaConvertor
+from schemaconvertor.diskcache import SchemaDiskCache
+
+SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "dict",
+        "properties": {"a": "integer"},
+        "patternProperties": {"^b": "string"},
+        "hook": {"post-convert": [lambda data, schema: len(data)]},
+    },
+}
+
+
+class TestSchemaDiskCache(TestCase):
+
+    def setUp(self):
+        self.directory = os.path.join(tempfile.mkdtemp(), "cache")
+
+    def tearDown(self):
+        shutil.rmtree(os.path.dirname(self.directory))
+
+    def files(self):
+        return sorted(os.listdir(self.directory))
+
+    def test_warm_start(self):
+        data = [{"a": "1", "b": 2, "c": 3}]
+        cache = SchemaDiskCache(self.directory)
+        cvtr = cache.get(SCHEMA)
+        self.assertEqual(cvtr(data), SchemaConvertor(SCHEMA)(data))
+        self.assertEqual(cache.stats(), {"hits": 0, "misses": 1})
+        self.assertEqual(len(self.files()), 1)
+
+        # another process builds its own schema tree and hooks
+        schema = dict(SCHEMA, items=dict(
+            SCHEMA["items"], hook={"post-convert": [lambda d, s: sorted(d)]}))
+        cache = SchemaDiskCache(self.directory)
+        self.assertEqual(cache.get(schema)(data), [["a", "b"]])
+        self.assertEqual(cache.stats(), {"hits": 1, "misses": 0})
+
+        cache.get(SCHEMA, lazy=True)
+        self.assertEqual(len(self.files()), 2)
+        cache.clear()
+        self.assertEqual(self.files(), [])
+
+    def test_key(self):
+        cache = SchemaDiskCache(self.directory)
+        key = cache.key("source")
+        self.assertEqual(key, SchemaDiskCache("other").key("source"))
+        self.assertNotEqual(key, cache.key("source2"))
+        origin = diskcache.__version__
+        diskcache.__version__ = origin + ".dev"
+        try:
+            self.assertNotEqual(key, cache.key("source"))
+        finally:
+            diskcache.__version__ = origin
+
+    def test_broken_file(self):
+        cache = SchemaDiskCache(self.directory)
+        cache.get("string")
+        path = os.path.join(self.directory, self.files()[0])
+        with open(path, "wb") as fp:
+            fp.write(b"broken")
+        self.assertEqual(cache.get("string")(1), "1")
+        self.assertEqual(cache.stats(), {"hits": 0, "misses": 2})
+        self.assertEqual(SchemaDiskCache(self.directory).get("string")(1), "1")
+
+    def test_readonly_directory(self):
+        os.makedirs(self.directory)
+        cache = SchemaDiskCache(os.path.join(self.directory, "file"))
+        with open(cache.directory, "w"):
+            pass
+        self.assertEqual(cache.get("integer")("1"), 1)
+        self.assertEqual(self.files(), ["file"])
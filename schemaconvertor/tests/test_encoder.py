@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import io
+import sys
+import json
+from unittest import TestCase
+from collections import namedtuple
+
+from schemaconvertor.convertor import SchemaConvertor
+from schemaconvertor.encoder import SchemaEncoder
+from schemaconvertor.tests import test_demo
+
+Pair = namedtuple("Pair", ["key", "value"])
+
+
+class TestSchemaEncoder(TestCase):
+
+    def assertEncoded(self, schema, data, **kwargs):
+        cvtr = SchemaConvertor(schema)
+        encoded = "".join(cvtr.iter_encode(data, **kwargs))
+        expected = json.dumps(cvtr(data), **kwargs)
+        if encoded != expected and sys.version_info < (3, 6):
+            # dicts have no order, compare the values
+            encoded, expected = json.loads(encoded), json.loads(expected)
+        self.assertEqual(encoded, expected)
+
+    def test_scalar(self):
+        self.assertEncoded("string", u"刘奕聪")
+        self.assertEncoded("string", u"刘奕聪", ensure_ascii=False)
+        self.assertEncoded("string", u"刘奕聪".encode("utf-8"))
+        self.assertEncoded("string", 1.5)
+        self.assertEncoded("integer", "2")
+        self.assertEncoded("float", "3.4")
+        self.assertEncoded("float", float("nan"))
+        self.assertEncoded("number", "5")
+        self.assertEncoded("number", 6.7)
+        self.assertEncoded("boolean", [])
+        self.assertEncoded("null", 8)
+        self.assertEncoded("raw", {"9": [0]})
+
+    def test_container(self):
+        self.assertEncoded({
+            "type": "dict",
+            "properties": {"key": "string", "value": "integer"},
+        }, {"key": 1, "value": "2", "other": 3})
+        self.assertEncoded({
+            "type": "dict",
+            "patternProperties": {"[a-z]": "string", "[0-9]": "number"},
+        }, {"a": 0, "1": "2", "b": "4"})
+        self.assertEncoded({
+            "type": "array",
+            "items": {"typeOf": {int: "string", "default": "null"}},
+        }, [1, "2", None])
+        self.assertEncoded({"typeOf": {}}, 1)
+        self.assertEncoded({
+            "type": "array",
+            "items": "integer",
+        }, range(3), separators=(",", ":"))
+
+    def test_demo(self):
+        user = test_demo.User("u1", "xxx")
+        admin = test_demo.Admin("a1", "xxx", 2)
+        book = test_demo.Book("b1", [user, admin])
+        book.tags["visited_cnt"] = 56
+        book.tags["attr"] = test_demo.Tag("public", "yes")
+        self.assertEncoded(test_demo.FULLBOOKSCHEMA, book)
+        self.assertEncoded(
+            test_demo.USERMIXTYPELISTSCHEMA, [user, admin, user])
+
+    def test_hooks(self):
+        self.assertEncoded({
+            "type": "object",
+            "properties": {
+                "key": {
+                    "type": "string",
+                    "hook": {"pre-convert": ["func_result"]},
+                },
+                "value": {
+                    "type": "integer",
+                    "hook": {"post-convert": [lambda d, s: [d, d]]},
+                },
+            },
+        }, Pair(lambda: "k", "1"))
+
+    def test_dump_chunks(self):
+        cvtr = SchemaConvertor({"type": "array", "items": "integer"})
+        count = SchemaEncoder.BUFFER_PARTS * 3
+        chunks = list(cvtr.iter_encode(iter(range(count))))
+        self.assertGreater(len(chunks), 2)
+        self.assertEqual(json.loads("".join(chunks)), list(range(count)))
+
+        # json of python 2 encodes to str
+        fp = io.BytesIO() if bytes is str else io.StringIO()
+        cvtr.dump(range(3), fp)
+        self.assertEqual(fp.getvalue(), "[0, 1, 2]")
+
+    def test_invalid_key(self):
+        self.assertEncoded({
+            "type": "dict",
+            "properties": {1: "string", None: "string"},
+        }, {1: 2, None: 3})
+        cvtr = SchemaConvertor({
+            "type": "dict",
+            "properties": {(1, 2): "string"},
+        })
+        with self.assertRaises(TypeError):
+            "".join(cvtr.iter_encode({(1, 2): 3}))
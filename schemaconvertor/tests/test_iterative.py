@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import sys
+from unittest import TestCase
+
+from schemaconvertor import convertor
+from schemaconvertor.tests import (
+    test_convertor_0_1, test_convertor_0_2, test_convertor_0_3, test_demo)
+from schemaconvertor.tests.test_compiler import CompiledEngineMixin
+
+
+class IterativeSchemaConvertor(convertor.SchemaConvertor):
+
+    def __init__(self, schema):
+        super(IterativeSchemaConvertor, self).__init__(schema, iterative=True)
+
+
+class IterativeEngineMixin(CompiledEngineMixin):
+    """Run a test case against the iterative engine
+    """
+    engine = IterativeSchemaConvertor
+
+
+class TestIterativeSimple(IterativeEngineMixin, test_convertor_0_1.TestSimple):
+    pass
+
+
+class TestIterativeSchemaConvertor(
+        IterativeEngineMixin, test_convertor_0_2.TestSchemaConvertor):
+    pass
+
+
+class TestIterativeHook(IterativeEngineMixin, test_convertor_0_3.TestHook):
+    pass
+
+
+class TestIterativeUser(IterativeEngineMixin, test_demo.TestUser):
+    pass
+
+
+class TestIterativeBook(IterativeEngineMixin, test_demo.TestBook):
+    pass
+
+
+class TestIterativeEngine(TestCase):
+
+    schema = {
+        "typeOf": {
+            list: {"type": "array", "items": {"$ref": "#"}},
+            dict: {
+                "type": "dict",
+                "properties": {"value": "integer"},
+                "patternProperties": {"^c": {"$ref": "#"}},
+            },
+            "default": "string",
+        },
+    }
+
+    def nested(self, depth):
+        data = 0
+        for _ in range(depth):
+            data = [data]
+        return data
+
+    def test_deep(self):
+        depth = sys.getrecursionlimit() * 2
+        cvtr = convertor.SchemaConvertor(self.schema, iterative=True)
+        result = cvtr(self.nested(depth))
+        for _ in range(depth):
+            result, = result
+        self.assertEqual(result, "0")
+
+    def test_order_and_hooks(self):
+        schema = {
+            "type": "dict",
+            "properties": {
+                "b": {
+                    "type": "array",
+                    "items": "integer",
+                    "hook": {"post-convert": [lambda d, s: d[::-1]]},
+                },
+                "a": {
+                    "typeOf": {int: "string"},
+                    "hook": {"post-convert": [lambda d, s: d + "!"]},
+                },
+            },
+            "patternProperties": {"^[ab]": "raw", "^c": "null"},
+        }
+        data = {"c": 1, "a": 2, "b": ["1", 2]}
+        result = convertor.SchemaConvertor(schema, iterative=True)(data)
+        self.assertEqual(result, convertor.SchemaConvertor(schema)(data))
+        if sys.version_info >= (3, 6):
+            # dicts have no order before
+            self.assertEqual(list(result), ["c", "a", "b"])
+        self.assertEqual(result, {"c": None, "a": "2!", "b": [2, 1]})
+
+    def test_limits(self):
+        cvtr = convertor.SchemaConvertor(
+            self.schema, iterative=True, max_depth=10)
+        self.assertEqual(
+            cvtr(self.nested(10)),
+            convertor.SchemaConvertor(self.schema)(self.nested(10)))
+        with self.assertRaises(convertor.ConvertLimitError):
+            cvtr(self.nested(11))
+
+        cvtr = convertor.SchemaConvertor(
+            self.schema, iterative=True, max_nodes=10)
+        self.assertEqual(len(cvtr([0] * 4)), 4)
+        with self.assertRaises(convertor.ConvertLimitError):
+            cvtr([0] * 5)
+
+    def test_options(self):
+        with self.assertRaises(ValueError):
+            convertor.SchemaConvertor("string", iterative=True, compiled=True)
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import multiprocessing
+from unittest import TestCase
+from collections import namedtuple
+
+from schemaconvertor.convertor import SchemaConvertor, ConvertLimitError
+from schemaconvertor.parallel import SchemaPickleError, chunked, get_context
+
+Pair = namedtuple("Pair", ["key", "value"])
+
+SCHEMA = {
+    "type": "object",
+    "properties": {
+        "key": "string",
+        "value": {
+            "type": "string",
+            "hook": {"pre-convert": ["func_result"]},
+        },
+    },
+}
+
+
+class TestParallel(TestCase):
+
+    def test_chunked(self):
+        self.assertEqual(list(chunked(range(5), 2)), [[0, 1], [2, 3], [4]])
+        self.assertEqual(list(chunked([], 2)), [])
+
+    def test_order(self):
+        cvtr = SchemaConvertor({"type": "array", "items": "string"})
+        data = [[i, i + 1] for i in range(100)]
+        self.assertEqual(
+            list(cvtr.map_parallel(data, workers=2, chunksize=7)),
+            [cvtr(item) for item in data])
+
+    def test_spawn(self):
+        if not hasattr(multiprocessing, "get_context"):
+            self.skipTest("start methods need python 3.4 or later")
+        cvtr = SchemaConvertor(SCHEMA, compiled=True)
+        data = [Pair(i, str) for i in range(10)]
+        self.assertEqual(
+            list(cvtr.map_parallel(
+                data, workers=2, chunksize=3, context="spawn")),
+            [{"key": str(i), "value": ""} for i in range(10)])
+
+    def test_unpicklable_hook(self):
+        if not hasattr(multiprocessing, "get_context"):
+            self.skipTest("start methods need python 3.4 or later")
+        cvtr = SchemaConvertor({
+            "type": "integer",
+            "hook": {"pre-convert": [lambda data, schema: data + 1]},
+        })
+        # raised by the call, before the first result is asked for
+        with self.assertRaises(SchemaPickleError):
+            cvtr.map_parallel(range(3), context="spawn")
+        self.assertEqual(
+            list(cvtr.map_parallel(range(3), fallback=True, context="spawn")),
+            [1, 2, 3])
+        # forked workers inherit the hooks
+        self.assertEqual(
+            list(cvtr.map_parallel(range(3), workers=2, context="fork")),
+            [1, 2, 3])
+
+    def test_default_context(self):
+        context = get_context()
+        self.assertIn(context.get_start_method(), ("fork", "spawn"))
+        self.assertIs(get_context(context), context)
+
+    def test_options(self):
+        schema = {
+            "typeOf": {
+                list: {"type": "array", "items": {"$ref": "#"}},
+                "default": "integer",
+            },
+        }
+        cvtr = SchemaConvertor(schema, iterative=True, max_depth=2)
+        self.assertEqual(
+            list(cvtr.map_parallel([[1], ["2"]], workers=2)), [[1], [2]])
+        with self.assertRaises(ConvertLimitError):
+            list(cvtr.map_parallel([[[[1]]]], workers=2))
+
+        cvtr = SchemaConvertor(
+            {"type": "array", "items": "integer"}, lazy=True)
+        with self.assertRaises(ValueError):
+            cvtr.map_parallel([[1]], workers=2)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import time
+from unittest import TestCase
+
+from schemaconvertor.convertor import SchemaConvertor
+from schemaconvertor.profiler import ProfiledSchemaConvertor, schema_paths
+
+
+def slow(data, schema):
+    time.sleep(0.01)
+    return data
+
+
+SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "dict",
+        "properties": {
+            "a/b": "string",
+            "value": {"type": "integer", "hook": {"pre-convert": [slow]}},
+        },
+        "patternProperties": {"^x": "number"},
+    },
+}
+
+
+class TestProfiledSchemaConvertor(TestCase):
+
+    def setUp(self):
+        self.cvtr = ProfiledSchemaConvertor(SCHEMA)
+        self.data = [{"a/b": 1, "value": "2", "x1": "1.5"}] * 2
+
+    def test_result(self):
+        self.assertEqual(self.cvtr(self.data), SchemaConvertor(SCHEMA)(self.data))
+
+    def test_paths(self):
+        self.assertEqual(sorted(schema_paths(self.cvtr.schema).values()), [
+            "#", "#/items", "#/items/patternProperties/^x",
+            "#/items/properties/a~1b", "#/items/properties/value",
+        ])
+
+    def test_stats(self):
+        self.cvtr(self.data)
+        stats = self.cvtr.stats
+        self.assertEqual(stats["#"].calls, 1)
+        self.assertEqual(stats["#/items"].calls, 2)
+        self.assertEqual(stats["#/items/properties/value"].calls, 2)
+        self.assertEqual(stats["#/items/patternProperties/^x"].calls, 2)
+
+        value = stats["#/items/properties/value"]
+        self.assertGreaterEqual(value.hook_time, 0.02)
+        self.assertGreaterEqual(value.self_time, value.hook_time)
+        # the hooks are timed in their own node, not in the root
+        self.assertLess(stats["#"].self_time, value.hook_time)
+        self.assertEqual(stats["#"].hook_time, 0)
+        self.assertGreaterEqual(stats["#"].total_time, 0.02)
+        self.assertEqual(self.cvtr.report()[0], value)
+        self.assertIn("#/items/properties/value", self.cvtr.format_report())
+
+        self.cvtr.reset()
+        self.assertEqual(self.cvtr.stats, {})
+
+    def test_collapsed_stacks(self):
+        self.cvtr(self.data)
+        stacks = dict(
+            line.rsplit(" ", 1) for line in self.cvtr.collapsed_stacks())
+        self.assertEqual(len(stacks), 5)
+        self.assertGreaterEqual(
+            int(stacks["#;#/items;#/items/properties/value"]), 20000)
+
+    def test_typeof(self):
+        cvtr = ProfiledSchemaConvertor({
+            "typeOf": {(int, float): "number", "default": "string"},
+        })
+        self.assertEqual(cvtr(1), 1)
+        self.assertEqual(cvtr("1"), "1")
+        self.assertEqual(sorted(cvtr.stats), [
+            "#", "#/typeOf/default", "#/typeOf/int,float"])
+
+    def test_identical_siblings(self):
+        cvtr = ProfiledSchemaConvertor({
+            "type": "dict",
+            "properties": {"name": "string", "email": "string", "bio": "string"},
+        })
+        cvtr({"name": 1, "email": 2, "bio": 3})
+        for name in ("name", "email", "bio"):
+            self.assertEqual(cvtr.stats["#/properties/%s" % name].calls, 1)
+        self.assertEqual(len(cvtr.collapsed_stacks()), 4)
+
+        cvtr = ProfiledSchemaConvertor({
+            "definitions": {"Node": {
+                "type": "array", "items": {"$ref": "#/definitions/Node"},
+            }},
+            "$ref": "#/definitions/Node",
+        })
+        self.assertEqual(cvtr([[[]], []]), [[[]], []])
+        # the items refer back to the root node
+        self.assertEqual(cvtr.stats["#"].calls, 4)
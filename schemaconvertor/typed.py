@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""Typed arrays for numeric items, NumPy arrays when NumPy is installed,
+array.array otherwise
+"""
+
+import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from schemaconvertor.convertor import (
+    SchemaConst, Types, FLOAT_EXACT_MAX, to_number)
+
+# number items are stored as integer or float by _number_items
+SCALARS = {
+    SchemaConst.T_INT: Types.IntType,
+    SchemaConst.T_FLOAT: Types.FloatType,
+}
+
+
+def _int64_typecode():
+    """Typecode of 64 bits integers, the array module of python 2 has no
+    "q" but its "l" is 64 bits on most 64 bits platforms
+    """
+    for typecode in ("q", "l"):
+        try:
+            if array.array(typecode).itemsize == 8:
+                return typecode
+        except ValueError:
+            pass
+
+
+TYPECODES = {
+    SchemaConst.T_INT: _int64_typecode(),
+    SchemaConst.T_FLOAT: "d",
+}
+DTYPES = {
+    SchemaConst.T_INT: "int64",
+    SchemaConst.T_FLOAT: "float64",
+}
+
+
+INT64_LIMIT = 2 ** 63
+
+
+def _fits_int64(data):
+    """Whether the items of a numeric ndarray can be stored as int64
+    """
+    kind = data.dtype.kind
+    if kind == "f":
+        # false for nan and inf as well
+        return bool((abs(data) < float(INT64_LIMIT)).all())
+    if kind == "u" and data.size:
+        return int(data.max()) < INT64_LIMIT
+    return True
+
+
+def _number_items(data):
+    """Convert number items as the scalar path does, return them with
+    integer when all of them are integers, with float when floats hold
+    them exactly, (None, None) otherwise
+    """
+    items = [to_number(item) for item in data]
+    floats = [type(item) is float for item in items]
+    if not any(floats):
+        return items, SchemaConst.T_INT
+    for item, is_float in zip(items, floats):
+        if not is_float and not -FLOAT_EXACT_MAX < item < FLOAT_EXACT_MAX:
+            return None, None
+    return items, SchemaConst.T_FLOAT
+
+
+def _numpy_array(data, type_):
+    if isinstance(data, numpy.ndarray) and data.ndim == 1 and \
+            data.dtype.kind in "biuf":
+        if type_ == SchemaConst.T_NUM:
+            type_ = SchemaConst.T_FLOAT if data.dtype.kind == "f" \
+                else SchemaConst.T_INT
+        if type_ == SchemaConst.T_INT and not _fits_int64(data):
+            return None
+        return data.astype(DTYPES[type_])
+    if type_ == SchemaConst.T_NUM:
+        data, type_ = _number_items(data)
+        if data is None:
+            return None
+    return numpy.fromiter(map(SCALARS[type_], data), DTYPES[type_])
+
+
+def typed_array(data, type_):
+    """Convert the items of data to a typed array of type_, return None
+    when some item can not be stored in it
+
+    Number items are stored as int64 when all of them are integers, as
+    float64 otherwise unless some integer is too large to stay exact.
+    """
+    try:
+        if numpy is not None:
+            return _numpy_array(data, type_)
+        if type_ == SchemaConst.T_NUM:
+            data, type_ = _number_items(data)
+            if data is None:
+                return None
+        return array.array(TYPECODES[type_], map(SCALARS[type_], data))
+    except (TypeError, ValueError, OverflowError):
+        return None
@@ -27,7 +27,10 @@ setup(
     author='Liu Yicong',
     author_email='imyikong@gmail.com',
     packages=find_packages(),
-    install_requires=(),
+    install_requires=(
+        # hook_workers
+        'futures; python_version < "3.2"',
+    ),
     license='BSD',
     classifiers=[
         'Development Status :: 3 - Alpha',